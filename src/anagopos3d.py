@@ -18,6 +18,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import threading
+import time
 import wx
 
 from os import environ as osenviron
@@ -26,11 +28,27 @@ from trs_terms.trs_parser import TRSParseException
 from lambda_terms.lambda_term_parser import LambdaTermParseException
 from trs_terms.trs_term_parser import TRSTermParseException
 from ubigraph import Ubigraph
+from reduction_graph import ReductionGraph, NO_HANDLE
+from graph_snapshot import GraphSnapshot, SnapshotException, write_snapshot
+from exploration_budget import ExplorationBudget
 
 import operations as operation
 
 TERM_PARSE_ERROR_COLOUR = "#BB4444"
 
+SNAPSHOT_FILES = "Reduction graphs (*.agr)|*.agr"
+
+# Calls to UbiGraph are sent by a worker thread in batches of at most
+# RENDER_BATCH calls. Exploration waits when RENDER_QUEUE calls are pending.
+RENDER_BATCH = 1000
+RENDER_QUEUE = 20000
+
+# The maximum number of steps to search for the normal form of a term
+NORMAL_FORM_FUEL = 10000
+
+# Minimum time in seconds between updates of the labels during a long operation
+LABEL_INTERVAL = 0.2
+
 ANAGAPOS = "Anagapos 3D"
 VERSION  = "Version 1.0"
 URL      = "https://github.com/jeroenk/Anagopos3D"
@@ -38,23 +56,41 @@ URL      = "https://github.com/jeroenk/Anagopos3D"
 RULE_SET_TEXT  = "Rule set: "
 BETA_REDUCTION = "beta-rule"
 
+ALL_REDEXES       = "All redexes"
+DECLARED_STRATEGY = "Declared strategy"
+
+BUDGET_LIMITS = ["Max terms", "Max depth", "Max term size", "Max seconds"]
+BUDGET_MAX    = 10000000
+
 DISP_TERMS_TEXT = "Displayed terms: "
 DISP_STEPS_TEXT = "Displayed steps: "
 
 class State:
     def __init__(self):
-        self.rule_dir = osenviron["HOME"]
+        self.rule_dir  = osenviron["HOME"]
+        self.graph_dir = osenviron["HOME"]
 
         self.ubi = Ubigraph()
+        self.ubi.startRenderQueue(RENDER_QUEUE, RENDER_BATCH)
+
+        # Shared with the iterator, so changes apply to the current graph.
+        self.budget = ExplorationBudget()
 
+        # The snapshot an opened graph decodes its terms from, if any.
+        self.snapshot     = None
         self.iterator     = None
-        self.terms        = {}
+        self.strategy     = None
+        self.skip         = 0
+        self.skip_size    = None
+        self.terms        = []
         self.term_count   = 0
         self.cur_term     = 0
-        self.reducts      = []
+        self.reducts      = ReductionGraph()
         self.reduct_count = 0
         self.cur_reduct   = 0
         self.changed      = False
+        self.normal_form  = None
+        self.normal_data  = None # its encoding, for an opened graph
 
         self.ubi.clear()
         self.set_vertex_style()
@@ -71,15 +107,32 @@ class State:
     def set_edge_style(self):
         self.edge = self.ubi.newEdgeStyle(width = "2.0", color = "#ffffff")
 
+    def set_term(self, number, vertex):
+        # Terms are numbered consecutively, hence the vertex of a term is
+        # either replaced or it is the next one to be added.
+        if number < len(self.terms):
+            self.terms[number] = vertex
+        else:
+            self.terms.append(vertex)
+
     def reset_terms(self):
+        if self.snapshot != None:
+            self.snapshot.close()
+
+        self.snapshot     = None
         self.iterator     = None
-        self.terms        = {}
+        self.strategy     = None
+        self.skip         = 0
+        self.skip_size    = None
+        self.terms        = []
         self.term_count   = 0
         self.cur_term     = 0
-        self.reducts      = []
+        self.reducts      = ReductionGraph()
         self.reduct_count = 0
         self.cur_reduct   = 0
         self.changed      = False
+        self.normal_form  = None
+        self.normal_data  = None # its encoding, for an opened graph
 
         self.ubi.clear()
         self.set_vertex_style()
@@ -94,6 +147,18 @@ class MainWindow(wx.Frame):
 
         self.state = State()
 
+        # Forward and Backward run in a worker thread; while one runs, the
+        # controls that change the graph are disabled.
+        self.busy          = False
+        self.cancel        = threading.Event()
+        self.last_update   = 0.0
+        self.color_initial = False
+        self.color_latest  = False
+
+        # The normal form is computed in a worker thread as well; it is set
+        # while the vertices added so far are checked against it.
+        self.normal_form_lock = threading.Lock()
+
         self.rule_set  = None
         self.rule_name = None
         self.signature = None
@@ -121,6 +186,12 @@ class MainWindow(wx.Frame):
         self.active_rule_file_text \
             = wx.StaticText(self, -1, RULE_SET_TEXT + BETA_REDUCTION)
 
+        # The strategy that selects the redexes to contract
+        self.strategy_choice = wx.Choice(self, -1)
+        self.strategy_choice.Bind(wx.EVT_CHOICE, self.StrategyChange)
+        self.strategy_choice.SetToolTip(wx.ToolTip("Reduction strategy"))
+        self.UpdateStrategies()
+
         # Sizes for the various buttons and text fields
         width         = 200
         spinner_width = 60
@@ -138,6 +209,8 @@ class MainWindow(wx.Frame):
         random_button   = wx.Button(self, 0, "Random Term", size = button_size)
         forward_button  = wx.Button(self, 0, "Forward", size = step_size)
         backward_button = wx.Button(self, 0, "Backward", size = step_size)
+        self.cancel_button = wx.Button(self, 0, "Cancel", size = button_size)
+        self.cancel_button.Enable(False)
 
         self.start_checkbox = wx.CheckBox(self, -1, "Color initial term")
         self.new_checkbox   = wx.CheckBox(self, -1, "Color latest term")
@@ -159,11 +232,29 @@ class MainWindow(wx.Frame):
         backward_box.Add(self.backward_spinner, 0,
                             wx.ALIGN_RIGHT | wx.ALIGN_CENTER_VERTICAL, 10)
 
+        # Spinners for the exploration budget, where 0 means no limit
+        self.budget_spinners = []
+        budget_box = wx.FlexGridSizer(len(BUDGET_LIMITS), 2, 3, 3)
+
+        for label in BUDGET_LIMITS:
+            spinner = wx.SpinCtrl(self, -1, "0", min = 0, max = BUDGET_MAX,
+                                      initial = 0, size = spinner_size)
+            budget_box.Add(wx.StaticText(self, -1, label), 0,
+                               wx.ALIGN_LEFT | wx.ALIGN_CENTER_VERTICAL)
+            budget_box.Add(spinner, 0,
+                               wx.ALIGN_RIGHT | wx.ALIGN_CENTER_VERTICAL)
+            self.budget_spinners.append(spinner)
+
+        budget_button = wx.Button(self, 0, "Run Until Budget",
+                                      size = button_size)
+
         # Button/spinner actions
         draw_button.Bind(wx.EVT_BUTTON, self.ResetGraph)
         random_button.Bind(wx.EVT_BUTTON, self.Generate)
         forward_button.Bind(wx.EVT_BUTTON, self.Forward)
         backward_button.Bind(wx.EVT_BUTTON, self.Backward)
+        budget_button.Bind(wx.EVT_BUTTON, self.RunUntilBudget)
+        self.cancel_button.Bind(wx.EVT_BUTTON, self.Cancel)
         self.start_checkbox.Bind(wx.EVT_CHECKBOX, self.StartCheck)
         self.new_checkbox.Bind(wx.EVT_CHECKBOX, self.NewCheck)
 
@@ -175,11 +266,15 @@ class MainWindow(wx.Frame):
         bts = wx.BoxSizer(wx.VERTICAL)
         bts.Add(radio_box, 0, wx.ALIGN_LEFT | wx.ALL, 10)
         bts.Add(self.active_rule_file_text, 0, wx.ALIGN_LEFT | wx.LEFT, 10)
+        bts.Add(self.strategy_choice, 0, wx.ALIGN_LEFT | wx.LEFT | wx.TOP, 10)
         bts.Add(self.term_input, 0, wx.ALIGN_CENTER | wx.ALL, 10)
         bts.Add(random_button, 0, wx.ALIGN_CENTER | wx.LEFT | wx.BOTTOM, 3)
         bts.Add(draw_button, 0, wx.ALIGN_CENTER | wx.LEFT | wx.BOTTOM, 3)
         bts.Add(forward_box, 0, wx.ALIGN_CENTER | wx.LEFT | wx.BOTTOM, 3)
         bts.Add(backward_box, 0, wx.ALIGN_CENTER | wx.LEFT | wx.BOTTOM, 3)
+        bts.Add(budget_box, 0, wx.ALIGN_CENTER | wx.ALL, 10)
+        bts.Add(budget_button, 0, wx.ALIGN_CENTER | wx.LEFT | wx.BOTTOM, 3)
+        bts.Add(self.cancel_button, 0, wx.ALIGN_CENTER | wx.LEFT | wx.BOTTOM, 3)
         bts.Add(self.start_checkbox, 0, wx.ALIGN_LEFT | wx.LEFT, 10)
         bts.Add(self.new_checkbox, 0, wx.ALIGN_LEFT | wx.LEFT | wx.BOTTOM, 10)
         bts.Add(self.disp_terms, 0, wx.ALIGN_LEFT | wx.LEFT | wx.BOTTOM, 10)
@@ -199,9 +294,15 @@ class MainWindow(wx.Frame):
         filemenu = wx.Menu()
 
         # Menu actions
-        menuitem = filemenu.Append(-1, "&Open Rule Set\tCtrl+O",
+        rule_item = filemenu.Append(-1, "&Open Rule Set\tCtrl+O",
                                                           "Load TRS rule set")
-        self.Bind(wx.EVT_MENU, self.OnLoadRuleSet, menuitem)
+        self.Bind(wx.EVT_MENU, self.OnLoadRuleSet, rule_item)
+        open_item = filemenu.Append(-1, "Open &Graph\tCtrl+G",
+                                        "Open a saved reduction graph")
+        self.Bind(wx.EVT_MENU, self.OnOpenGraph, open_item)
+        save_item = filemenu.Append(-1, "&Save Graph\tCtrl+S",
+                                        "Save the reduction graph")
+        self.Bind(wx.EVT_MENU, self.OnSaveGraph, save_item)
 
         filemenu.AppendSeparator()
         menuitem = filemenu.Append(wx.ID_ABOUT)
@@ -214,6 +315,17 @@ class MainWindow(wx.Frame):
         menubar.Append(filemenu, "&File")
         self.SetMenuBar(menubar)
 
+        self.Bind(wx.EVT_CLOSE, self.OnClose)
+
+        # Everything that is disabled while the graph is being changed
+        self.controls = [self.radio_lambda, self.radio_trs,
+                         self.strategy_choice, self.term_input,
+                         draw_button, random_button, forward_button,
+                         backward_button, self.forward_spinner,
+                         self.backward_spinner, budget_button, rule_item,
+                         open_item, save_item, self.start_checkbox,
+                         self.new_checkbox] + self.budget_spinners
+
         # Give window its proper size
         self.Fit()
 
@@ -260,6 +372,110 @@ class MainWindow(wx.Frame):
 
             self.rule_name = rulename
 
+    def OnSaveGraph(self, _):
+        if self.state.iterator == None:
+            self.SetStatusText("No graph to save")
+            return
+
+        dlg = wx.FileDialog(self, "Save reduction graph", self.state.graph_dir,
+                                "", SNAPSHOT_FILES,
+                                wx.SAVE | wx.OVERWRITE_PROMPT)
+
+        if dlg.ShowModal() != wx.ID_OK:
+            return
+
+        name = dlg.GetPath()
+        self.state.graph_dir = dlg.GetDirectory()
+
+        # The snapshot of an opened graph may be the one that is replaced.
+        if self.state.snapshot != None:
+            self.state.reducts.loadTerms()
+            self.state.snapshot.close()
+            self.state.snapshot = None
+
+        # An opened graph that was not extended keeps its own maximum size.
+        if self.state.skip > 0:
+            size = self.state.skip_size
+        else:
+            size = self.state.budget.size
+
+        try:
+            write_snapshot(name, self.state.reducts, operation.get_mode(),
+                               self.signature, self.state.strategy, size)
+        except (IOError, OSError, SnapshotException) as exception:
+            self.SetStatusText(str(exception))
+            return
+
+        self.SetStatusText("Graph saved")
+
+    def OnOpenGraph(self, _):
+        dlg = wx.FileDialog(self, "Open reduction graph", self.state.graph_dir,
+                                "", SNAPSHOT_FILES, wx.OPEN)
+
+        if dlg.ShowModal() != wx.ID_OK:
+            return
+
+        name = dlg.GetPath()
+        self.state.graph_dir = dlg.GetDirectory()
+
+        try:
+            snapshot = GraphSnapshot(name)
+        except (IOError, OSError, SnapshotException) as exception:
+            self.SetStatusText(str(exception))
+            return
+
+        try:
+            if snapshot.getMode() == "lambda":
+                if operation.get_mode() != "lambda":
+                    self.radio_lambda.SetValue(True)
+                    self.SetRadioVal(None)
+            elif operation.get_mode() != "trs" \
+                    or snapshot.getSignature() != self.signature:
+                self.SetStatusText("Open the rule set of the graph first")
+                return
+
+            if not self.SelectStrategy(snapshot.getStrategy()):
+                self.SetStatusText("Unsupported strategy in snapshot")
+                return
+
+            self.LoadGraph(snapshot)
+        finally:
+            # An opened graph keeps its snapshot to decode terms from.
+            if self.state.snapshot is not snapshot:
+                snapshot.close()
+
+    def LoadGraph(self, snapshot):
+        self.state.reset_terms()
+
+        term = snapshot.getTerm(0)
+        self.term_input.SetValue(str(term))
+        self.term_input.SetBackgroundColour("#FFFFFF")
+
+        # The iterator is only advanced past the saved steps when the graph
+        # is extended beyond them, with the strategy and maximum term size
+        # they were found with.
+        self.state.budget.size = snapshot.getSizeLimit()
+        self.budget_spinners[2].SetValue(self.state.budget.size or 0)
+
+        self.state.iterator \
+            = operation.iterate(term, self.rule_set, budget = self.state.budget,
+                                    strategy = self.GetStrategy())
+        self.state.strategy     = snapshot.getStrategy()
+        self.state.skip         = len(snapshot) + 1
+        self.state.skip_size    = snapshot.getSizeLimit()
+        self.state.snapshot     = snapshot
+        self.state.reducts      = snapshot.toReductionGraph(lazy = True)
+        self.state.term_count   = snapshot.getTermCount()
+        self.state.reduct_count = len(snapshot)
+        self.state.changed      = False
+
+        self.FindNormalForm(term)
+        self.AddVertex(0)
+        self.ColorInitial()
+        self.UpdateLabels()
+        self.RunInBackground(self.ForwardTask, self.state.reduct_count,
+                                 "Graph opened")
+
     def SetRadioVal(self, _):
         self.state.reset_terms()
 
@@ -280,19 +496,69 @@ class MainWindow(wx.Frame):
                 self.UpdateRuleInfo(self.rule_name)
                 # mode already set by LoadRuleSet
 
+        self.UpdateStrategies()
+
     def UpdateRuleInfo(self, text):
         self.active_rule_file_text.SetLabel(RULE_SET_TEXT + text)
 
+    def UpdateStrategies(self):
+        # The first choice is the default: the strategy declared by the rule
+        # set, if any.
+        if self.rule_set == None:
+            default = ALL_REDEXES
+        elif self.rule_set.getStrategy() == None:
+            default = DECLARED_STRATEGY + " (full)"
+        else:
+            default = DECLARED_STRATEGY + " (" \
+                + self.rule_set.getStrategy() + ")"
+
+        self.strategy_choice.SetItems([default] + operation.get_strategies())
+        self.strategy_choice.SetSelection(0)
+
+    def SelectStrategy(self, name):
+        '''
+        Select the named strategy, where None stands for contracting all
+        redexes. Return whether the strategy is available.
+        '''
+        if name == None and self.rule_set != None:
+            name = "full" # the first choice is the declared strategy
+
+        if name == None:
+            self.strategy_choice.SetSelection(0)
+            return True
+
+        return self.strategy_choice.SetStringSelection(name)
+
+    def GetStrategy(self):
+        if self.strategy_choice.GetSelection() <= 0:
+            return None
+
+        return self.strategy_choice.GetStringSelection()
+
     def OnExit(self, _):
         self.Close(True)
 
+    def OnClose(self, event):
+        self.cancel.set()
+
+        # Draw what is still queued, as the graph outlives the program.
+        try:
+            self.state.ubi.stopRenderQueue()
+        except Exception:
+            pass
+
+        event.Skip()
+
     def TextChange(self, _):
         self.term_input.SetBackgroundColour("#FFFFFF")
         self.state.changed = True
 
+    def StrategyChange(self, _):
+        self.state.changed = True
+
     def ColorInitial(self):
-        latest  = self.state.cur_term == 0 and self.new_checkbox.GetValue()
-        initial = self.start_checkbox.GetValue()
+        latest  = self.state.cur_term == 0 and self.color_latest
+        initial = self.color_initial
 
         if initial and latest:
             self.state.terms[0].set(color = "#00ffff")
@@ -304,8 +570,8 @@ class MainWindow(wx.Frame):
             self.state.terms[0].set(color = "#ff0000")
 
     def ColorLatest(self):
-        latest  = self.new_checkbox.GetValue()
-        initial = self.state.cur_term == 0 and self.start_checkbox.GetValue()
+        latest  = self.color_latest
+        initial = self.state.cur_term == 0 and self.color_initial
 
         if initial and latest:
             self.state.terms[self.state.cur_term].set(color = "#00ffff")
@@ -330,40 +596,143 @@ class MainWindow(wx.Frame):
 
         self.SetStatusText("Parsing successful")
 
-        term.addRuleSetForIter(self.rule_set)
-        self.state.iterator = iter(term)
+        # The iterator checks the size of the initial term right away.
+        self.UpdateBudget(False)
+        self.state.iterator = operation.iterate(term, self.rule_set,
+                                                budget = self.state.budget,
+                                                strategy = self.GetStrategy())
+        self.state.strategy = operation.get_strategy_name(self.GetStrategy(),
+                                                          self.rule_set)
+        self.FindNormalForm(term)
         (term, number, _, _) = self.state.iterator.next()
-        vertex = self.state.ubi.newVertex(style = self.state.vertex)
-        self.state.terms[number] = vertex
+        self.state.reducts.addTerm(number, term)
+        self.AddVertex(number)
         self.state.term_count = 1
         self.ColorInitial()
-        self.disp_terms.SetLabel(DISP_TERMS_TEXT + str(self.state.cur_term + 1))
-        self.disp_steps.SetLabel(DISP_STEPS_TEXT + str(self.state.cur_reduct))
+        self.UpdateLabels()
         return
 
     def GetReduct(self):
         cur_reduct = self.state.cur_reduct
 
         if cur_reduct < self.state.reduct_count:
-            (number, previous, new_dst, _) = self.state.reducts[cur_reduct]
+            (previous, number, new_dst) = self.state.reducts.getStep(cur_reduct)
             new_reduct = False
         else:
-            (_, number, previous, new_dst) = self.state.iterator.next()
+            (term, number, previous, new_dst) = self.NextReduct()
             new_reduct = True
 
             if new_dst:
+                self.state.reducts.addTerm(number, term)
                 self.state.term_count += 1
 
             self.state.reduct_count += 1
 
         if new_dst:
-            vertex = self.state.ubi.newVertex(style = self.state.vertex)
-            self.state.terms[number] = vertex
+            if number < len(self.state.terms):
+                # Hidden by Backward; show it again at its old position.
+                self.state.terms[number].set(visible = "true")
+            else:
+                self.AddVertex(number)
+
             self.state.cur_term += 1
 
         self.state.cur_reduct += 1
         return (new_reduct, number, previous, new_dst)
 
+    def AddVertex(self, number):
+        vertex = self.state.ubi.newVertex(style = self.state.vertex)
+        self.state.set_term(number, vertex)
+
+        self.normal_form_lock.acquire()
+
+        try:
+            if self.IsNormalForm(number):
+                vertex.set(shape = "octahedron")
+            elif self.state.iterator.isTruncated(number):
+                vertex.set(shape = "cube") # too large to be expanded
+        finally:
+            self.normal_form_lock.release()
+
+    def IsNormalForm(self, number):
+        normal_form = self.state.normal_form
+
+        if normal_form == None:
+            return False
+
+        # Terms of an opened graph that were not decoded yet are compared by
+        # their encoding, so they need not be decoded here.
+        reducts = self.state.reducts
+
+        if self.state.snapshot == None or reducts.hasTerm(number):
+            return reducts.getTerm(number) is normal_form
+
+        data = self.state.snapshot.getTermData(number)
+        return data == self.state.normal_data
+
+    def FindNormalForm(self, term):
+        '''
+        Compute the normal form of the term in a worker thread, if supported,
+        so its vertex can be marked once it is reached.
+        '''
+        if not operation.has_normaliser():
+            return
+
+        thread = threading.Thread(target = self.NormalFormTask,
+                                  args = (self.state.iterator, term))
+        thread.daemon = True
+        thread.start()
+
+    def NormalFormTask(self, iterator, term):
+        try:
+            (normal_form, steps) = operation.normalise(term, NORMAL_FORM_FUEL)
+        except Exception as exception:
+            wx.CallAfter(self.SetStatusText, str(exception))
+            return
+
+        wx.CallAfter(self.SetNormalForm, iterator, normal_form, steps)
+
+    def SetNormalForm(self, iterator, normal_form, steps):
+        if self.state.iterator is not iterator:
+            return # the graph was reset in the meantime
+
+        # Vertices added before the normal form was known are marked here,
+        # later ones by AddVertex.
+        self.normal_form_lock.acquire()
+
+        try:
+            self.state.normal_form = normal_form
+
+            if normal_form != None and self.state.snapshot != None:
+                self.state.normal_data = operation.encode(normal_form)
+
+            for number in range(len(self.state.terms)):
+                if self.IsNormalForm(number):
+                    self.state.terms[number].set(shape = "octahedron")
+        finally:
+            self.normal_form_lock.release()
+
+        if normal_form == None:
+            self.SetStatusText("No normal form within " + str(steps) \
+                                   + " steps")
+        else:
+            self.SetStatusText("Normal form after " + str(steps) \
+                                   + " normal order steps")
+
+    def NextReduct(self):
+        # Steps of a graph that was opened are already known.
+        if self.state.skip > 0 \
+                and self.state.budget.size != self.state.skip_size:
+            raise Exception("Set the maximum term size to " \
+                                + str(self.state.skip_size or 0) \
+                                + " to extend the opened graph")
+
+        while self.state.skip > 0:
+            self.state.iterator.next()
+            self.state.skip -= 1
+
+        return self.state.iterator.next()
+
     def Forward(self, _):
         self.SetStatusText("")
         reduct_count = self.forward_spinner.GetValue()
@@ -376,43 +745,125 @@ class MainWindow(wx.Frame):
             if self.state.iterator == None or reduct_count == 0:
                 return
 
+        if count == 1:
+            done = "Added 1 step"
+        else:
+            done = "Added " + str(count) + " steps"
+
+        self.UpdateBudget(False)
+        self.RunInBackground(self.ForwardTask, reduct_count, done)
+
+    def RunUntilBudget(self, _):
+        self.SetStatusText("")
+
+        if self.state.iterator == None or self.state.changed:
+            self.ResetGraph(None)
+
+            if self.state.iterator == None:
+                return
+
+        self.UpdateBudget(True)
+        self.RunInBackground(self.ForwardTask, -1, None)
+
+    def UpdateBudget(self, with_deadline):
+        limits = []
+
+        for spinner in self.budget_spinners:
+            if spinner.GetValue() == 0:
+                limits.append(None)
+            else:
+                limits.append(spinner.GetValue())
+
+        budget = self.state.budget
+        (budget.nodes, budget.depth, budget.size, seconds) = limits
+
+        if with_deadline:
+            budget.setTimeLimit(seconds)
+        else:
+            budget.setTimeLimit(None)
+
+    def RunInBackground(self, task, *args):
+        self.SetBusy(True)
+        self.cancel.clear()
+
+        thread = threading.Thread(target = task, args = args)
+        thread.daemon = True
+        thread.start()
+
+    def Finish(self, status):
+        self.SetBusy(False)
+        self.UpdateLabels()
+        self.SetStatusText(status)
+
+    def SetBusy(self, busy):
+        self.busy = busy
+
+        for control in self.controls:
+            control.Enable(not busy)
+
+        self.cancel_button.Enable(busy)
+
+    def Cancel(self, _):
+        self.cancel.set()
+
+    def ForwardTask(self, reduct_count, done):
+        '''
+        Add steps to the graph; runs in a worker thread.
+        '''
+        status = done
+
         try:
-            while reduct_count != 0:
-                (new_reduct, number, previous, new_dst) = self.GetReduct()
+            added = self.AddSteps(reduct_count)
 
-                if new_dst:
-                    if number - 1 == 0:
-                        self.ColorInitial()
-                    else:
-                        self.state.terms[number - 1].set(color = "#ff0000")
+            if added != reduct_count:
+                status = "Cancelled after " + str(added) + " steps"
+        except StopIteration:
+            if self.state.iterator.stopped != None:
+                status = "Budget reached (" + self.state.iterator.stopped + ")"
+            else:
+                status = "Graph complete"
+        except Exception as exception:
+            status = str(exception)
 
-                    self.ColorLatest()
+        wx.CallAfter(self.Finish, status)
 
-                if (number != previous):
-                    s = self.state.terms[previous]
-                    t = self.state.terms[number]
-                    edge = self.state.ubi.newEdge(s, t, style = self.state.edge)
-                else:
-                    edge = None
+    def AddSteps(self, reduct_count):
+        added = 0
 
-                reduct = (number, previous, new_dst, edge)
-                if new_reduct:
-                    self.state.reducts.append(reduct)
+        while reduct_count != 0 and not self.cancel.isSet():
+            (new_reduct, number, previous, new_dst) = self.GetReduct()
+
+            if new_dst:
+                if number - 1 == 0:
+                    self.ColorInitial()
                 else:
-                    self.state.reducts[self.state.cur_reduct - 1] = reduct
+                    self.state.terms[number - 1].set(color = "#ff0000")
 
-                reduct_count -= 1
-                self.disp_terms.SetLabel(DISP_TERMS_TEXT \
-                                             + str(self.state.cur_term + 1))
-                self.disp_steps.SetLabel(DISP_STEPS_TEXT \
-                                             + str(self.state.cur_reduct))
+                self.ColorLatest()
 
-            if count == 1:
-                self.SetStatusText("Added 1 step")
+            if new_reduct:
+                edge = NO_HANDLE
             else:
-                self.SetStatusText("Added " + str(count) + " steps")
-        except StopIteration:
-            self.SetStatusText("Graph complete")
+                edge = self.state.reducts.getHandle(self.state.cur_reduct - 1)
+
+            if edge != NO_HANDLE:
+                self.state.ubi.setEdgeAttribute(edge, "visible", "true")
+            elif (number != previous):
+                s = self.state.terms[previous]
+                t = self.state.terms[number]
+                edge = self.state.ubi.newEdge(s, t, style = self.state.edge)
+                edge = edge.id
+
+            if new_reduct:
+                self.state.reducts.addStep(previous, number, new_dst, edge)
+            else:
+                self.state.reducts.setHandle(self.state.cur_reduct - 1, edge)
+
+            reduct_count -= 1
+            added += 1
+            self.ShowProgress()
+
+        return added
 
     def Backward(self, _):
         self.SetStatusText("")
@@ -422,44 +873,69 @@ class MainWindow(wx.Frame):
 
         reduct_count = self.backward_spinner.GetValue()
         reduct_count = min(self.state.cur_reduct, reduct_count)
-        count = reduct_count
+        self.RunInBackground(self.BackwardTask, reduct_count)
 
-        while reduct_count > 0:
-            self.state.cur_reduct -= 1
-            (number, previous, new, edge) \
-                = self.state.reducts[self.state.cur_reduct]
+    def BackwardTask(self, reduct_count):
+        '''
+        Remove steps from the graph; runs in a worker thread.
+        '''
+        try:
+            removed = self.RemoveSteps(reduct_count)
+
+            if removed < reduct_count:
+                status = "Cancelled after " + str(removed) + " steps"
+            elif removed == 1:
+                status = "Removed 1 step"
+            else:
+                status = "Removed " + str(removed) + " steps"
+        except Exception as exception:
+            status = str(exception)
+
+        wx.CallAfter(self.Finish, status)
+
+    def RemoveSteps(self, reduct_count):
+        removed = 0
 
-            if edge != None:
-                edge.destroy()
+        while removed < reduct_count and not self.cancel.isSet():
+            self.state.cur_reduct -= 1
+            (_, number, new) = self.state.reducts.getStep(self.state.cur_reduct)
+            edge = self.state.reducts.getHandle(self.state.cur_reduct)
 
-            reduct = (number, previous, new, None)
-            self.state.reducts[self.state.cur_reduct] = reduct
+            # Steps are hidden rather than removed, so stepping forward again
+            # only has to show them.
+            if edge != NO_HANDLE:
+                self.state.ubi.setEdgeAttribute(edge, "visible", "false")
 
-            if self.state.reducts[self.state.cur_reduct][2]:
-                number = self.state.reducts[self.state.cur_reduct][0]
-                self.state.terms[number].destroy()
-                self.state.terms[number] = None
+            if new:
+                self.state.terms[number].set(visible = "false")
                 self.state.cur_term -= 1
                 self.ColorLatest()
 
-            reduct_count -= 1
-            self.disp_terms.SetLabel(DISP_TERMS_TEXT \
-                                         + str(self.state.cur_term + 1))
-            self.disp_steps.SetLabel(DISP_STEPS_TEXT \
-                                         + str(self.state.cur_reduct))
+            removed += 1
+            self.ShowProgress()
 
+        return removed
 
-        if count == 1:
-            self.SetStatusText("Removed 1 step")
-        else:
-            self.SetStatusText("Removed " + str(count) + " steps")
+    def ShowProgress(self):
+        now = time.time()
 
+        if now - self.last_update >= LABEL_INTERVAL:
+            self.last_update = now
+            wx.CallAfter(self.UpdateLabels)
+
+    def UpdateLabels(self):
+        self.disp_terms.SetLabel(DISP_TERMS_TEXT + str(self.state.cur_term + 1))
+        self.disp_steps.SetLabel(DISP_STEPS_TEXT + str(self.state.cur_reduct))
 
     def StartCheck(self, _):
+        self.color_initial = self.start_checkbox.GetValue()
+
         if self.state.iterator != None:
             self.ColorInitial()
 
     def NewCheck(self, _):
+        self.color_latest = self.new_checkbox.GetValue()
+
         if self.state.iterator != None:
             self.ColorLatest()
 
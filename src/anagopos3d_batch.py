@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+# Anagopos 3D: A Reduction Graph Visualizer for Term Rewriting and λ-Calculus
+#
+# Copyright (C) 2011 Jeroen Ketema
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Compute reduction graphs without a graphical interface. The graph of a term is
+explored breadth-first, as in the interactive tool, until it is complete or
+one of the given limits is reached, and is written to a file.
+'''
+
+import os
+import sys
+import time
+
+from optparse import OptionParser
+
+from trs_terms.trs_parser import TRSParseException
+from lambda_terms.lambda_term_parser import LambdaTermParseException
+from trs_terms.trs_term_parser import TRSTermParseException
+
+from parallel_explorer import ParallelTermIterator
+from fingerprint_set import FingerprintSet, FingerprintException
+from spilling_queue import SpillingQueue
+from exploration_budget import ExplorationBudget
+from reduction_graph import ReductionGraph
+from lambda_terms.lambda_strategies import STRATEGIES as lambda_strategies
+from trs_terms.trs_strategies import STRATEGIES as trs_strategies
+from graph_snapshot import SnapshotException, write_snapshot
+
+import operations as operation
+
+USAGE = "usage: %prog [options] term"
+
+FORMATS = ["edges", "dot"]
+
+class EdgeWriter:
+    '''
+    Write one line per reduction step, containing the numbers of the source
+    and target terms. If terms are included, each term is written on a line
+    of its own when it is first encountered. Terms that were not expanded,
+    because they are too large, are listed on lines starting with "x", the
+    normal form on a line starting with "n".
+    '''
+    def __init__(self, output, with_terms):
+        self.output     = output
+        self.with_terms = with_terms
+
+    def start(self):
+        return
+
+    def term(self, number, term, truncated):
+        if self.with_terms:
+            self.output.write("t " + str(number) + " " + str(term) + "\n")
+
+        if truncated:
+            self.output.write("x " + str(number) + "\n")
+
+    def normal_form(self, number):
+        self.output.write("n " + str(number) + "\n")
+
+    def step(self, source, target, new):
+        self.output.write(str(source) + " " + str(target) + "\n")
+
+    def end(self):
+        return
+
+class DotWriter:
+    '''
+    Write the graph in the dot language of GraphViz.
+    '''
+    def __init__(self, output, with_terms):
+        self.output     = output
+        self.with_terms = with_terms
+
+    def start(self):
+        self.output.write("digraph reduction_graph {\n")
+
+    def term(self, number, term, truncated):
+        attributes = []
+
+        if self.with_terms:
+            label = str(term).replace("\\", "\\\\").replace("\"", "\\\"")
+            attributes.append("label=\"" + label + "\"")
+
+        if truncated:
+            attributes.append("style=dashed")
+
+        if attributes == []:
+            self.output.write("  " + str(number) + ";\n")
+        else:
+            self.output.write("  " + str(number) + " [" \
+                                  + ", ".join(attributes) + "];\n")
+
+    def normal_form(self, number):
+        self.output.write("  " + str(number) + " [shape=doublecircle];\n")
+
+    def step(self, source, target, new):
+        self.output.write("  " + str(source) + " -> " + str(target) + ";\n")
+
+    def end(self):
+        self.output.write("}\n")
+
+class SnapshotWriter:
+    '''
+    Record the graph for a snapshot, while passing it on to another writer.
+    '''
+    def __init__(self, writer):
+        self.writer = writer
+        self.graph  = ReductionGraph()
+
+    def start(self):
+        self.writer.start()
+
+    def term(self, number, term, truncated):
+        self.graph.addTerm(number, term)
+        self.writer.term(number, term, truncated)
+
+    def normal_form(self, number):
+        self.writer.normal_form(number)
+
+    def step(self, source, target, new):
+        self.graph.addStep(source, target, new)
+        self.writer.step(source, target, new)
+
+    def end(self):
+        self.writer.end()
+
+class Limits:
+    def __init__(self, nodes = None, edges = None, seconds = None):
+        self.nodes   = nodes
+        self.edges   = edges
+        self.seconds = seconds
+
+def explore(iterator, writer, limits, normal_form = None):
+    '''
+    Explore the graph produced by the iterator and write it, marking the
+    normal form if it is given. Returns the number of terms and steps written
+    and whether the graph is complete, i.e., whether neither the limits nor
+    the budget of the iterator stopped the exploration and all terms were
+    expanded.
+    '''
+    if limits.seconds == None:
+        deadline = None
+    else:
+        deadline = time.time() + limits.seconds
+
+    nodes     = 0
+    edges     = 0
+    truncated = 0
+    complete  = False
+
+    writer.start()
+
+    try:
+        while True:
+            if limits.nodes != None and nodes >= limits.nodes:
+                break
+
+            if limits.edges != None and edges >= limits.edges:
+                break
+
+            if deadline != None and time.time() >= deadline:
+                break
+
+            (term, number, previous, new) = iterator.next()
+
+            if new:
+                is_truncated = iterator.isTruncated(number)
+                writer.term(number, term, is_truncated)
+                nodes += 1
+
+                if normal_form != None and term is normal_form:
+                    writer.normal_form(number)
+
+                if is_truncated:
+                    truncated += 1
+
+            if previous != -1:
+                writer.step(previous, number, new)
+                edges += 1
+    except StopIteration:
+        complete = iterator.stopped == None and truncated == 0
+
+    writer.end()
+    return (nodes, edges, complete)
+
+def make_parser():
+    parser = OptionParser(usage = USAGE)
+    parser.add_option("-r", "--rules", dest = "rules", metavar = "FILE",
+                      help = "TRS in TPDB format (default: lambda-calculus)")
+    parser.add_option("-o", "--output", dest = "output", metavar = "FILE",
+                      help = "file to write the graph to (default: stdout)")
+    parser.add_option("-f", "--format", dest = "format", default = "edges",
+                      choices = FORMATS,
+                      help = "output format: " + ", ".join(FORMATS) \
+                          + " (default: %default)")
+    parser.add_option("--terms", dest = "terms", action = "store_true",
+                      default = False, help = "include the terms in the output")
+    parser.add_option("-n", "--max-nodes", dest = "nodes", type = "int",
+                      metavar = "N", help = "stop after N terms")
+    parser.add_option("-e", "--max-edges", dest = "edges", type = "int",
+                      metavar = "N", help = "stop after N steps")
+    parser.add_option("-t", "--time-limit", dest = "seconds", type = "float",
+                      metavar = "SECONDS", help = "stop after SECONDS seconds")
+    parser.add_option("-d", "--max-depth", dest = "depth", type = "int",
+                      metavar = "N", help = "do not expand terms at distance " \
+                          + "N from the initial term")
+    parser.add_option("-z", "--max-size", dest = "size", type = "int",
+                      metavar = "N", help = "do not expand terms with more " \
+                          + "than N symbols")
+    parser.add_option("--strategy", dest = "strategy", metavar = "NAME",
+                      help = "only contract the redexes selected by a " \
+                          + "strategy; lambda-calculus: " \
+                          + ", ".join(sorted(lambda_strategies.keys())) \
+                          + "; TRS: " \
+                          + ", ".join(sorted(trs_strategies.keys())) \
+                          + " (default: the strategy declared by the TRS)")
+    parser.add_option("--normal-form", dest = "normal_form",
+                      action = "store_true", default = False,
+                      help = "compute the normal form directly and mark it " \
+                          + "in the graph (lambda-calculus only)")
+    parser.add_option("--fuel", dest = "fuel", type = "int", default = 100000,
+                      metavar = "N", help = "give up on the normal form " \
+                          + "after N steps (default: %default)")
+    parser.add_option("-j", "--jobs", dest = "jobs", type = "int",
+                      metavar = "N", help = "explore with N worker processes")
+    parser.add_option("--fingerprints", dest = "fingerprints",
+                      action = "store_true", default = False,
+                      help = "remember only 128-bit fingerprints of the terms")
+    parser.add_option("--verify", dest = "verify", action = "store_true",
+                      default = False,
+                      help = "detect fingerprint collisions (implies " \
+                          + "--fingerprints)")
+    parser.add_option("-m", "--memory-limit", dest = "memory", type = "int",
+                      metavar = "MB", help = "move terms still to explore " \
+                          + "to disk when using more than MB megabytes")
+    parser.add_option("--spill-dir", dest = "spill_dir", metavar = "DIR",
+                      help = "directory for terms moved to disk")
+    parser.add_option("-s", "--snapshot", dest = "snapshot", metavar = "FILE",
+                      help = "also save the graph as a snapshot, which can " \
+                          + "be opened in the interactive tool")
+    return parser
+
+def main(arguments):
+    parser = make_parser()
+    (options, arguments) = parser.parse_args(arguments)
+
+    if len(arguments) != 1:
+        parser.error("expected exactly one term")
+
+    if options.jobs != None \
+            and (options.depth != None or options.size != None):
+        parser.error("--max-depth and --max-size cannot be used with --jobs")
+
+    # The worker processes keep their own seen-sets.
+    if options.jobs != None and (options.fingerprints or options.verify):
+        parser.error("--fingerprints and --verify cannot be used with --jobs")
+
+    # The coordinator of the worker processes keeps the frontier in memory.
+    if options.jobs != None and options.memory != None:
+        parser.error("--memory-limit cannot be used with --jobs")
+
+    # Terms can be deep, while parsing and reduction are recursive.
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+
+    try:
+        if options.rules == None:
+            operation.set_mode("lambda")
+            (rule_set, signature) = (None, None)
+        else:
+            operation.set_mode("trs")
+            (rule_set, signature) = operation.parse_rule_set(options.rules)
+
+        term = operation.parse(arguments[0], signature)
+
+        if options.strategy != None \
+                and options.strategy not in operation.get_strategies():
+            parser.error("unsupported strategy in " + operation.get_mode() \
+                             + " mode: " + options.strategy)
+
+        if options.normal_form and not operation.has_normaliser():
+            parser.error("--normal-form is not supported in " \
+                             + operation.get_mode() + " mode")
+    except (TRSParseException, LambdaTermParseException,
+            TRSTermParseException, IOError, OSError) as exception:
+        sys.stderr.write(str(exception) + "\n")
+        return 1
+
+    term.addRuleSetForIter(rule_set)
+
+    # The snapshot is only written after the exploration, which may take long.
+    if options.snapshot != None:
+        directory = os.path.dirname(os.path.abspath(options.snapshot))
+
+        if not os.access(directory, os.W_OK):
+            sys.stderr.write("Cannot write a snapshot to " + directory + "\n")
+            return 1
+
+    if options.output == None:
+        output = sys.stdout
+    else:
+        try:
+            output = open(options.output, 'w')
+        except IOError as exception:
+            sys.stderr.write(str(exception) + "\n")
+            return 1
+
+    if options.format == "dot":
+        writer = DotWriter(output, options.terms)
+    else:
+        writer = EdgeWriter(output, options.terms)
+
+    if options.snapshot != None:
+        writer = SnapshotWriter(writer)
+
+    if options.fingerprints or options.verify:
+        seen = FingerprintSet(operation.encode, options.verify)
+    else:
+        seen = None
+
+    if options.memory == None:
+        todo = None
+    else:
+        todo = SpillingQueue(options.memory * 1024 * 1024, options.spill_dir,
+                             operation.encode, operation.decode)
+
+    if options.depth == None and options.size == None:
+        budget = None
+    else:
+        budget = ExplorationBudget(depth = options.depth, size = options.size)
+
+    if options.jobs == None:
+        iterator = operation.iterate(term, rule_set, seen, todo, budget,
+                                     options.strategy)
+    else:
+        strategy = operation.get_strategy(options.strategy, rule_set)
+        iterator = ParallelTermIterator(term, rule_set, options.jobs,
+                                        operation.get_codec(), strategy)
+
+    limits = Limits(options.nodes, options.edges, options.seconds)
+    start  = time.time()
+
+    if options.normal_form:
+        (normal_form, steps) = operation.normalise(term, options.fuel)
+
+        if normal_form == None:
+            sys.stderr.write("No normal form within " + str(steps) \
+                                 + " steps\n")
+        else:
+            sys.stderr.write("Normal form after " + str(steps) \
+                                 + " normal order steps: " \
+                                 + str(normal_form) + "\n")
+    else:
+        normal_form = None
+
+    try:
+        (nodes, edges, complete) = explore(iterator, writer, limits,
+                                           normal_form)
+    except FingerprintException as exception:
+        sys.stderr.write(str(exception) + "\n")
+        return 1
+    finally:
+        if output != sys.stdout:
+            output.close()
+
+        if options.jobs != None:
+            iterator.close()
+
+            for statistics in iterator.statistics:
+                sys.stderr.write(str(statistics) + "\n")
+
+        if todo != None:
+            todo.close()
+            sys.stderr.write("Spilled " + str(todo.spilled_entries) \
+                                 + " terms (" + str(todo.spilled_bytes) \
+                                 + " bytes) to disk\n")
+
+    if options.snapshot != None:
+        try:
+            strategy = operation.get_strategy_name(options.strategy, rule_set)
+            write_snapshot(options.snapshot, writer.graph,
+                           operation.get_mode(), signature, strategy,
+                           options.size)
+        except (IOError, OSError, SnapshotException) as exception:
+            sys.stderr.write(str(exception) + "\n")
+            return 1
+
+    status = "complete" if complete else "incomplete"
+    sys.stderr.write("Terms: " + str(nodes) + ", steps: " + str(edges) \
+                         + ", time: %.2fs, graph " % (time.time() - start) \
+                         + status + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
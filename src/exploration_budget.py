@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# Anagopos 3D: A Reduction Graph Visualizer for Term Rewriting and λ-Calculus
+#
+# Copyright (C) 2011 Jeroen Ketema
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Limits on the exploration of a reduction graph by the term iterators.
+
+An iterator with a budget stops before it expands a term when the graph has
+reached the maximum number of terms, when the term is at the maximum depth
+(its distance from the initial term), or when the deadline has passed. It then
+stops as if the graph were complete and records why it stopped. The budget
+may be changed afterwards; the iterator then continues where it stopped.
+
+Terms larger than the maximum size are not expanded at all: the iterator marks
+them as truncated when they are found.
+'''
+
+import time
+
+NODES, DEPTH, DEADLINE = ("terms", "depth", "time")
+
+class ExplorationBudget:
+    def __init__(self, nodes = None, depth = None, size = None,
+                 seconds = None):
+        self.nodes = nodes
+        self.depth = depth
+        self.size  = size
+        self.setTimeLimit(seconds)
+
+    def setTimeLimit(self, seconds):
+        if seconds == None:
+            self.deadline = None
+        else:
+            self.deadline = time.time() + seconds
+
+    def exhausted(self, count, depth):
+        '''
+        Return which limit stops the expansion of a term at the given depth,
+        when count terms are known, or None if there is none.
+        '''
+        if self.nodes != None and count >= self.nodes:
+            return NODES
+
+        if self.depth != None and depth >= self.depth:
+            return DEPTH
+
+        if self.deadline != None and time.time() >= self.deadline:
+            return DEADLINE
+
+        return None
+
+    def truncates(self, term):
+        return self.size != None and term.getSize() > self.size
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# Anagopos 3D: A Reduction Graph Visualizer for Term Rewriting and λ-Calculus
+#
+# Copyright (C) 2011 Jeroen Ketema
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+A replacement for the dictionary of seen terms kept by the term iterators that
+stores only a 128-bit fingerprint (the MD5 digest) of the canonical encoding of
+each term, instead of the term itself. Terms are then only kept in memory while
+they are waiting to be explored.
+
+Two distinct terms have the same fingerprint with probability 2^-128, and the
+probability that any two of n terms collide is at most n^2 / 2^129; even for
+10^9 terms this is below 10^-20. A collision merges two vertices of the graph.
+If verification is enabled, a second, independent 64-bit checksum (part of the
+SHA-1 digest) is stored with every fingerprint and a collision of fingerprints
+is detected unless the checksums collide as well, which happens with
+probability 2^-64 per collision.
+'''
+
+from hashlib import md5, sha1
+
+class FingerprintException(Exception):
+    pass
+
+def encode_string(term):
+    string = term.toString()
+
+    if isinstance(string, unicode):
+        string = string.encode("utf-8")
+
+    return string
+
+class FingerprintSet:
+    def __init__(self, encode = encode_string, verify = False):
+        self.encode  = encode
+        self.numbers = {}
+        self.checks  = {} if verify else None
+
+        # The iterators look up the same term several times in a row.
+        self.last_term   = None
+        self.last_digest = None
+        self.last_check  = None
+
+    def fingerprint(self, term):
+        if term is not self.last_term:
+            data = self.encode(term)
+            self.last_term   = term
+            self.last_digest = md5(data).digest()
+
+            if self.checks != None:
+                self.last_check = sha1(data).digest()[:8]
+
+        return self.last_digest
+
+    def __contains__(self, term):
+        digest = self.fingerprint(term)
+
+        if digest not in self.numbers:
+            return False
+
+        if self.checks != None and self.checks[digest] != self.last_check:
+            raise FingerprintException("Fingerprint collision detected for " \
+                                           + str(term))
+
+        return True
+
+    def __getitem__(self, term):
+        return self.numbers[self.fingerprint(term)]
+
+    def __setitem__(self, term, number):
+        digest = self.fingerprint(term)
+        self.numbers[digest] = number
+
+        if self.checks != None:
+            self.checks[digest] = self.last_check
+
+    def __len__(self):
+        return len(self.numbers)
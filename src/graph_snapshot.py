@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+# Anagopos 3D: A Reduction Graph Visualizer for Term Rewriting and λ-Calculus
+#
+# Copyright (C) 2011 Jeroen Ketema
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Snapshots of reduction graphs on disk.
+
+A snapshot consists of the following sections, all numbers little-endian:
+
+  header      magic, version, mode, number of steps, number of terms, length
+              of the signature, maximum term size (0 if none), and name of the
+              strategy (empty if all redexes are contracted) (48 bytes)
+  signature   one line "symbol arity" per function symbol, in UTF-8 (TRS only)
+  sources     the source of every step (32-bit)
+  targets     the target of every step (32-bit)
+  flags       the flags of every step (8-bit)
+  offsets     the offset of every term in the term blob, followed by the
+              length of the blob (64-bit)
+  terms       the compact binary encodings of the terms, in order
+
+Sections are padded to a multiple of 8 bytes. A snapshot is read through a
+memory map, so steps and terms can be looked up without reading the whole
+file. The strategy and the maximum term size determine the order in which an
+iterator finds the steps, so they are needed to extend the graph. Snapshots
+are written to a temporary file that replaces the target only once it is
+complete, hence a crash never leaves a partial snapshot behind.
+'''
+
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+from array import array
+
+import lambda_terms.lambda_term_codec as lambda_term_codec
+from trs_terms.trs_term_codec import TRSTermCodec
+from reduction_graph import ReductionGraph, NEW_TARGET, NO_HANDLE
+
+MAGIC   = "ANAGOPOS"
+VERSION = 2
+MODES   = ["lambda", "trs"]
+
+HEADER = struct.Struct("<8sIIIIII16s")
+STEP   = struct.Struct("<i")
+OFFSET = struct.Struct("<Q")
+
+STRATEGY_SIZE = 16
+
+class SnapshotException(Exception):
+    pass
+
+def padding(size):
+    return -size % 8
+
+def make_codec(mode, signature):
+    if mode == "lambda":
+        return lambda_term_codec
+    else:
+        return TRSTermCodec(signature)
+
+def encode_signature(signature):
+    lines = []
+
+    for name in sorted(signature.keys()):
+        if isinstance(name, unicode):
+            name = name.encode("utf-8")
+
+        lines.append(name + " " + str(signature[name]) + "\n")
+
+    return "".join(lines)
+
+def decode_signature(data):
+    signature = {}
+
+    for line in data.decode("utf-8").splitlines():
+        (name, arity) = line.rsplit(" ", 1)
+        signature[name] = int(arity)
+
+    return signature
+
+def little_endian(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+
+    return values.tostring()
+
+def replace_file(source, target):
+    if os.name == "nt" and os.path.exists(target):
+        os.remove(target) # Windows cannot rename over an existing file
+
+    os.rename(source, target)
+
+def sync_directory(directory):
+    '''
+    Make the rename of a snapshot durable; not every platform supports this.
+    '''
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except (OSError, AttributeError):
+        return
+
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+def write_snapshot(file_name, graph, mode, signature = None, strategy = None,
+                   size = None):
+    '''
+    Write a reduction graph, which should keep its terms, to a snapshot. The
+    signature is required in TRS mode. The graph was explored with the named
+    strategy and maximum term size, if any.
+    '''
+    if mode not in MODES:
+        raise SnapshotException("Unsupported mode: " + mode)
+
+    if strategy == None:
+        strategy = ""
+    elif isinstance(strategy, unicode):
+        strategy = strategy.encode("utf-8")
+
+    if len(strategy) > STRATEGY_SIZE:
+        raise SnapshotException("Strategy name too long: " + strategy)
+
+    codec = make_codec(mode, signature)
+
+    if mode == "trs":
+        signature_data = encode_signature(signature)
+    else:
+        signature_data = ""
+
+    terms   = []
+    offsets = []
+    length  = 0
+
+    for number in range(graph.getTermCount()):
+        term = graph.getTerm(number)
+
+        if term == None:
+            raise SnapshotException("Term " + str(number) + " is missing")
+
+        data = codec.encode(term)
+        terms.append(data)
+        offsets.append(length)
+        length += len(data)
+
+    offsets.append(length)
+
+    steps  = len(graph)
+    header = HEADER.pack(MAGIC, VERSION, MODES.index(mode), steps,
+                         len(terms), len(signature_data), size or 0,
+                         strategy)
+
+    directory = os.path.dirname(os.path.abspath(file_name))
+    (descriptor, temporary) = tempfile.mkstemp(prefix = ".snapshot-",
+                                               dir = directory)
+
+    try:
+        # Temporary files are private, snapshots should not be.
+        mask = os.umask(0)
+        os.umask(mask)
+        os.chmod(temporary, 0666 & ~mask)
+
+        output = os.fdopen(descriptor, "wb")
+
+        try:
+            output.write(header)
+            output.write(signature_data)
+            output.write("\0" * padding(len(signature_data)))
+            output.write(little_endian(graph.sources))
+            output.write(little_endian(graph.targets))
+            output.write(graph.flags.tostring())
+            output.write("\0" * padding(steps))
+            output.write("".join([OFFSET.pack(offset) for offset in offsets]))
+            output.write("".join(terms))
+            output.flush()
+            os.fsync(output.fileno())
+        finally:
+            output.close()
+
+        replace_file(temporary, file_name)
+    except:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+        raise
+
+    sync_directory(directory)
+
+class GraphSnapshot:
+    '''
+    A snapshot opened for reading. Steps and terms are read from the memory
+    map when they are requested.
+    '''
+    def __init__(self, file_name):
+        self.file = open(file_name, "rb")
+        self.map  = None
+
+        try:
+            self.open()
+        except:
+            self.close()
+            raise
+
+    def open(self):
+        self.file.seek(0, os.SEEK_END)
+        file_size = self.file.tell()
+
+        if file_size < HEADER.size:
+            raise SnapshotException("Not a reduction graph snapshot")
+
+        self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+
+        (magic, version, mode, steps, terms, signature_size, size,
+         strategy) = HEADER.unpack_from(self.map, 0)
+
+        if magic != MAGIC:
+            raise SnapshotException("Not a reduction graph snapshot")
+
+        if version != VERSION:
+            raise SnapshotException("Unsupported snapshot version: " \
+                                        + str(version))
+
+        if mode >= len(MODES):
+            raise SnapshotException("Unsupported mode in snapshot")
+
+        self.mode     = MODES[mode]
+        self.steps    = steps
+        self.terms    = terms
+        self.size     = size or None
+        self.strategy = strategy.rstrip("\0") or None
+
+        self.signature_offset = HEADER.size
+        self.sources_offset   = self.signature_offset + signature_size \
+            + padding(signature_size)
+        self.targets_offset   = self.sources_offset + STEP.size * steps
+        self.flags_offset     = self.targets_offset + STEP.size * steps
+        self.offsets_offset   = self.flags_offset + steps + padding(steps)
+        self.terms_offset     = self.offsets_offset \
+            + OFFSET.size * (terms + 1)
+
+        if file_size < self.terms_offset \
+                or file_size < self.terms_offset + self.getTermOffset(terms):
+            raise SnapshotException("Truncated snapshot")
+
+        if self.mode == "trs":
+            start = self.signature_offset
+            end   = start + signature_size
+            self.signature = decode_signature(self.map[start:end])
+        else:
+            self.signature = None
+
+        self.codec = make_codec(self.mode, self.signature)
+
+    def getMode(self):
+        return self.mode
+
+    def getSignature(self):
+        return self.signature
+
+    def getStrategy(self):
+        '''
+        Return the name of the strategy the graph was explored with, or None
+        if all redexes were contracted.
+        '''
+        return self.strategy
+
+    def getSizeLimit(self):
+        '''
+        Return the maximum size of the terms that were expanded, or None if
+        there was no maximum.
+        '''
+        return self.size
+
+    def getTermOffset(self, number):
+        offset = self.offsets_offset + OFFSET.size * number
+        return OFFSET.unpack_from(self.map, offset)[0]
+
+    def getTermCount(self):
+        return self.terms
+
+    def getTermData(self, number):
+        if number < 0 or number >= self.terms:
+            raise IndexError("term number out of range")
+
+        start = self.terms_offset + self.getTermOffset(number)
+        end   = self.terms_offset + self.getTermOffset(number + 1)
+        return self.map[start:end]
+
+    def getTerm(self, number):
+        return self.codec.decode(self.getTermData(number))
+
+    def getStep(self, i):
+        '''
+        Return the source, target, and whether the target is new for a step.
+        '''
+        if i < 0 or i >= self.steps:
+            raise IndexError("step number out of range")
+
+        offset    = STEP.size * i
+        (source,) = STEP.unpack_from(self.map, self.sources_offset + offset)
+        (target,) = STEP.unpack_from(self.map, self.targets_offset + offset)
+        flags     = ord(self.map[self.flags_offset + i])
+        return (source, target, flags & NEW_TARGET != 0)
+
+    def __len__(self):
+        return self.steps
+
+    def toReductionGraph(self, keep_terms = True, lazy = False):
+        '''
+        Copy the snapshot into a reduction graph. The steps are copied as a
+        whole; terms are only decoded if they are kept. Lazily, a term is only
+        decoded when the graph is first asked for it, so the snapshot should
+        stay open until the graph has loaded its terms (see loadTerms).
+        '''
+        sources = self.sources_offset
+        targets = self.targets_offset
+        flags   = self.flags_offset
+
+        graph = ReductionGraph(keep_terms)
+        graph.sources.fromstring(self.map[sources:targets])
+        graph.targets.fromstring(self.map[targets:flags])
+        graph.flags.fromstring(self.map[flags:flags + self.steps])
+        graph.handles.fromlist([NO_HANDLE] * self.steps)
+
+        if sys.byteorder == "big":
+            graph.sources.byteswap()
+            graph.targets.byteswap()
+
+        if keep_terms and lazy:
+            graph.terms  = [None] * self.terms
+            graph.loader = self.getTerm
+        elif keep_terms:
+            for number in range(self.terms):
+                graph.addTerm(number, self.getTerm(number))
+
+        return graph
+
+    def close(self):
+        if self.map != None:
+            self.map.close()
+            self.map = None
+
+        if self.file != None:
+            self.file.close()
+            self.file = None
@@ -16,12 +16,68 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import threading
+
 from collections import deque
+from weakref import WeakValueDictionary
 
 class LambdaException(Exception):
     pass
 
+# All lambda terms are hash-consed: every distinct term is constructed only
+# once and kept in the table below for as long as it is referenced elsewhere.
+# Hence, two terms are equal if and only if they are identical, and the hash
+# of a term can be computed once from the hashes of its direct subterms. As
+# terms are shared, they are immutable: operations on terms return the
+# original subterms wherever these do not change.
+#
+# Each term also records a bound on its free de Bruijn indices: all free
+# indices of a term are smaller than its free_bound. Substituting in or
+# renumbering from an index at or above this bound leaves the term unchanged,
+# which is checked in constant time. In particular, closed terms have bound 0.
+#
+# The compact binary encoding of a term (see lambda_term_codec) is stored in
+# the term once it has been computed, so the encodings of shared subterms are
+# computed only once.
+terms = WeakValueDictionary()
+
+# Terms are built by several threads in the GUI (see anagopos3d), so new terms
+# are added to the table under a lock.
+terms_lock = threading.Lock()
+
+def add_term(key, term):
+    '''
+    Add a new term to the table and return it, unless another thread added
+    an equal term first, which is then returned instead.
+    '''
+    terms_lock.acquire()
+
+    try:
+        existing = terms.get(key)
+
+        if existing != None:
+            return existing
+
+        terms[key] = term
+        return term
+    finally:
+        terms_lock.release()
+
+ABS_TAG, APP_TAG, VAR_TAG = range(3)
+
+# Whether beta-redexes are contracted by means of explicit substitutions
+# (see ExplicitSubstitution) or by the substitute methods of the terms.
+explicit_substitutions = True
+
+def use_explicit_substitutions(flag):
+    global explicit_substitutions
+
+    explicit_substitutions = flag
+
 class LambdaTerm(object):
+    __slots__ = ('hash_value', 'free_bound', 'size', 'encoding',
+                 '__weakref__')
+
     def isAbs(self):
         return False
 
@@ -37,6 +93,48 @@ class LambdaTerm(object):
     def getRedexPositions(self):
         return []
 
+    def getSize(self):
+        return self.size
+
+    def getSubterm(self, position):
+        term = self
+
+        for i in position:
+            if i == 0:
+                term = term.subterm
+            elif i == 1:
+                term = term.left
+            else: # i == 2
+                term = term.right
+
+        return term
+
+    def updateRedexPositions(self, redexes, position):
+        '''
+        Return the redex positions of the term, where the term is the reduct
+        obtained by contracting the redex at the given position in a term with
+        the given redex positions. Only the contractum and its parent, which
+        might have become a redex, are inspected.
+        '''
+        length    = len(position)
+        positions = []
+
+        for redex in redexes:
+            if redex[:length] != position:
+                positions.append(redex)
+
+        for redex in self.getSubterm(position).getRedexPositions():
+            positions.append(position + redex)
+
+        if length > 0 and position[-1] == 1:
+            parent = position[:-1]
+
+            if self.getSubterm(parent).isRedex():
+                positions.append(parent)
+
+        positions.sort()
+        return positions
+
     def substitute(self, term, i):
         raise LambdaException("Not implemented")
 
@@ -47,28 +145,28 @@ class LambdaTerm(object):
         raise LambdaException("Invalid operation")
 
     def isEqual(self, term):
-        return False
+        return self is term
 
     def copy(self):
-        raise LambdaException("Not implemented")
+        return self
 
     def toString(self):
         raise LambdaException("Not implemented")
 
     def __eq__(self, other):
-        if not isinstance(other, LambdaTerm):
-            return False
-
-        return self.isEqual(other)
+        return self is other
 
     def __ne__(self, other):
-        if not isinstance(other, LambdaTerm):
-            return True
-
-        return not self.isEqual(other)
+        return self is not other
 
     def __hash__(self):
-        return self.toString().__hash__()
+        return self.hash_value
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise LambdaException("Lambda terms are immutable")
+
+        super(LambdaTerm, self).__setattr__(name, value)
 
     def __str__(self):
         return self.toString()
@@ -80,10 +178,24 @@ class LambdaTerm(object):
         return LambdaTermIterator(self)
 
 class LambdaAbs(LambdaTerm):
-    def __init__(self, subterm):
-        super(LambdaAbs, self).__init__()
+    __slots__ = ('subterm',)
+
+    def __new__(cls, subterm):
+        key  = (ABS_TAG, subterm)
+        term = terms.get(key)
+
+        if term == None:
+            term = object.__new__(cls)
+            term.subterm    = subterm
+            term.free_bound = max(subterm.free_bound - 1, 0)
+            term.size       = subterm.size + 1
+            term.hash_value = hash(key)
+            term = add_term(key, term)
+
+        return term
 
-        self.subterm = subterm
+    def __reduce__(self):
+        return (LambdaAbs, (self.subterm,))
 
     def isAbs(self):
         return True
@@ -96,11 +208,25 @@ class LambdaAbs(LambdaTerm):
         return positions
 
     def substitute(self, term, i):
+        if self.free_bound <= i:
+            return self
+
         subterm = self.subterm.substitute(term, i + 1)
+
+        if subterm is self.subterm:
+            return self
+
         return LambdaAbs(subterm)
 
     def renumber(self, i, j):
+        if self.free_bound <= j:
+            return self
+
         subterm = self.subterm.renumber(i, j + 1)
+
+        if subterm is self.subterm:
+            return self
+
         return LambdaAbs(subterm)
 
     def reduce(self, position):
@@ -110,25 +236,29 @@ class LambdaAbs(LambdaTerm):
             subterm = self.subterm.reduce(position[1:])
             return LambdaAbs(subterm)
 
-    def isEqual(self, term):
-        if not term.isAbs():
-            return False
-
-        return self.subterm.isEqual(term.subterm)
-
-    def copy(self):
-        subterm = self.subterm.copy()
-        return LambdaAbs(subterm)
-
     def toString(self):
         return "(\\" + self.subterm.toString() + ")"
 
 class LambdaApp(LambdaTerm):
-    def __init__(self, left, right):
-        super(LambdaApp, self).__init__()
+    __slots__ = ('left', 'right')
+
+    def __new__(cls, left, right):
+        key  = (APP_TAG, left, right)
+        term = terms.get(key)
+
+        if term == None:
+            term = object.__new__(cls)
+            term.left       = left
+            term.right      = right
+            term.free_bound = max(left.free_bound, right.free_bound)
+            term.size       = left.size + right.size + 1
+            term.hash_value = hash(key)
+            term = add_term(key, term)
 
-        self.left  = left
-        self.right = right
+        return term
+
+    def __reduce__(self):
+        return (LambdaApp, (self.left, self.right))
 
     def isApp(self):
         return True
@@ -150,13 +280,27 @@ class LambdaApp(LambdaTerm):
         return positions
 
     def substitute(self, term, i):
+        if self.free_bound <= i:
+            return self
+
         left  = self.left.substitute(term, i)
         right = self.right.substitute(term, i)
+
+        if left is self.left and right is self.right:
+            return self
+
         return LambdaApp(left, right)
 
     def renumber(self, i, j):
+        if self.free_bound <= j:
+            return self
+
         left  = self.left.renumber(i, j)
         right = self.right.renumber(i, j)
+
+        if left is self.left and right is self.right:
+            return self
+
         return LambdaApp(left, right)
 
     def reduce(self, position):
@@ -165,98 +309,261 @@ class LambdaApp(LambdaTerm):
                 raise LambdaException("Invalid operation")
             else:
                 subterm = self.left.subterm
-                return subterm.substitute(self.right, 0)
+
+                if explicit_substitutions:
+                    return ExplicitSubstitution(self.right).apply(subterm, 0)
+                else:
+                    return subterm.substitute(self.right, 0)
         elif position[0] == 1:
-            left  = self.left.reduce(position[1:])
-            right = self.right.copy()
-            return LambdaApp(left, right)
+            left = self.left.reduce(position[1:])
+            return LambdaApp(left, self.right)
         elif position[0] == 2:
-            left  = self.left.copy()
             right = self.right.reduce(position[1:])
-            return LambdaApp(left, right)
+            return LambdaApp(self.left, right)
         else:
             raise LambdaException("Invalid operation")
 
-    def isEqual(self, term):
-        if not term.isApp():
-            return False
-
-        return self.left.isEqual(term.left) and self.right.isEqual(term.right)
-
-    def copy(self):
-        left  = self.left.copy()
-        right = self.right.copy()
-        return LambdaApp(left, right)
-
     def toString(self):
         return "(" + self.left.toString() + self.right.toString() + ")"
 
 class LambdaVar(LambdaTerm):
-    def __init__(self, value):
-        super(LambdaVar, self).__init__()
+    __slots__ = ('value',)
 
-        self.value = value
+    def __new__(cls, value):
+        key  = (VAR_TAG, value)
+        term = terms.get(key)
+
+        if term == None:
+            term = object.__new__(cls)
+            term.value      = value
+            term.free_bound = value + 1
+            term.size       = 1
+            term.hash_value = hash(key)
+            term = add_term(key, term)
+
+        return term
+
+    def __reduce__(self):
+        return (LambdaVar, (self.value,))
 
     def isVar(self):
         return True
 
     def substitute(self, term, i):
         if self.value < i:
-            return LambdaVar(self.value)
+            return self
         elif self.value == i:
             return term.renumber(i, 0)
         else: # self.value > i
             return LambdaVar(self.value - 1)
 
     def renumber(self, i, j):
-        if self.value < j:
-            return LambdaVar(self.value)
+        if self.value < j or i == 0:
+            return self
         else: # self.value >= j
             return LambdaVar(self.value + i)
 
-    def isEqual(self, term):
-        if not term.isVar():
-            return False
-
-        return self.value == term.value
-
-    def copy(self):
-        return LambdaVar(self.value)
-
     def toString(self):
         return str(self.value)
 
-class LambdaTermIterator:
+class ExplicitSubstitution:
+    '''
+    The substitution of a term for de Bruijn index 0, as performed when a
+    beta-redex is contracted, represented as an explicit substitution. A
+    closure, i.e., a term paired with the number of abstractions the
+    substitution has been pushed under, is pushed down only once: the results
+    of pushing down closures and of shifting the substituted term are kept.
+    As terms are hash-consed, subterms that are shared or that occur several
+    times are hence substituted in or renumbered only once, instead of once
+    per occurrence.
+    '''
     def __init__(self, term):
+        self.term     = term
+        self.closures = {}
+        self.shifts   = {}
+
+    def apply(self, term, depth):
+        if term.free_bound <= depth:
+            return term
+        elif term.isVar():
+            if term.value == depth:
+                return self.shift(self.term, depth, 0)
+            else: # term.value > depth
+                return LambdaVar(term.value - 1)
+
+        closure = (term, depth)
+
+        if closure not in self.closures:
+            if term.isAbs():
+                subterm = self.apply(term.subterm, depth + 1)
+
+                if subterm is term.subterm:
+                    result = term
+                else:
+                    result = LambdaAbs(subterm)
+            else: # term.isApp()
+                left  = self.apply(term.left, depth)
+                right = self.apply(term.right, depth)
+
+                if left is term.left and right is term.right:
+                    result = term
+                else:
+                    result = LambdaApp(left, right)
+
+            self.closures[closure] = result
+
+        return self.closures[closure]
+
+    def shift(self, term, i, j):
+        '''
+        Renumber the term as term.renumber(i, j) would.
+        '''
+        if term.free_bound <= j:
+            return term
+        elif term.isVar():
+            return term.renumber(i, j)
+
+        shift = (term, i, j)
+
+        if shift not in self.shifts:
+            if term.isAbs():
+                subterm = self.shift(term.subterm, i, j + 1)
+
+                if subterm is term.subterm:
+                    result = term
+                else:
+                    result = LambdaAbs(subterm)
+            else: # term.isApp()
+                left  = self.shift(term.left, i, j)
+                right = self.shift(term.right, i, j)
+
+                if left is term.left and right is term.right:
+                    result = term
+                else:
+                    result = LambdaApp(left, right)
+
+            self.shifts[shift] = result
+
+        return self.shifts[shift]
+
+class LambdaTermIterator:
+    '''
+    Iterate over the steps of the reduction graph of a term, breadth-first.
+    The terms seen so far are kept in a dictionary, unless another mapping
+    from terms to their numbers is given (e.g., a FingerprintSet). Likewise,
+    the terms still to be explored are kept in a deque, unless another queue
+    is given (e.g., a SpillingQueue, which may drop the redex positions).
+
+    If a budget is given (see ExplorationBudget), the iterator stops when a
+    limit of the budget is reached, recording the limit in stopped, and does
+    not expand terms that are too large, which are marked as truncated.
+
+    If a strategy is given (see lambda_strategies), only the redexes selected
+    by the strategy are contracted.
+    '''
+    def __init__(self, term, seen = None, todo = None, budget = None,
+                 strategy = None):
+        if seen == None:
+            seen = {}
+
+        if todo == None:
+            todo = deque()
+
+        self.strategy = strategy
+
+        seen[term] = 0
+
+        # Like its reducts, the initial term is not expanded if it is too
+        # large.
+        if budget != None and budget.truncates(term):
+            truncated = set([0])
+        else:
+            truncated = set()
+            todo.append((term, 0, self.getRedexPositions(term)))
+
         self.term    = term
-        self.seen    = {term : 0}
-        self.todo    = deque([(term, 0)])
+        self.seen    = seen
+        self.todo    = todo
         self.count   = 0
         self.reducts = deque([(term, 0, -1, True)])
 
+        self.budget    = budget
+        self.stopped   = None
+        self.truncated = truncated
+
+        # The term taken from the queue but not expanded yet, the depth of
+        # the last term expanded, and the number of the last term at that
+        # depth.
+        self.pending   = None
+        self.depth     = 0
+        self.level_end = 0
+
     def __iter__(self):
-        return LambdaTermIterator(self.term)
+        return LambdaTermIterator(self.term, strategy = self.strategy)
+
+    def isTruncated(self, number):
+        return number in self.truncated
+
+    def getRedexPositions(self, term):
+        if self.strategy == None:
+            return term.getRedexPositions()
+
+        return self.strategy(term)
 
     def next(self):
         if self.reducts != deque([]):
             reduct = self.reducts.popleft()
             return reduct
 
-        if self.todo == deque([]):
-            raise StopIteration
+        if self.pending == None:
+            if len(self.todo) == 0:
+                self.stopped = None
+                raise StopIteration
+
+            self.pending = self.todo.popleft()
+
+        (term, number, redexes) = self.pending
+
+        # Terms are numbered breadth-first, so a term is one level deeper
+        # than the last one expanded iff it was found after that level.
+        if number > self.level_end:
+            depth = self.depth + 1
+        else:
+            depth = self.depth
 
-        (term, number) = self.todo.popleft()
+        if self.budget != None:
+            self.stopped = self.budget.exhausted(self.count + 1, depth)
 
-        for position in term.getRedexPositions():
+            if self.stopped != None:
+                raise StopIteration
+
+        if depth != self.depth:
+            self.depth     = depth
+            self.level_end = self.count
+
+        self.pending = None
+
+        if redexes == None:
+            redexes = self.getRedexPositions(term)
+
+        for position in redexes:
             reduct = term.reduce(position)
             new = False
 
             if reduct not in self.seen:
                 self.count += 1
                 self.seen[reduct] = self.count
-                self.todo.append((reduct, self.count))
                 new = True
 
+                if self.budget != None and self.budget.truncates(reduct):
+                    self.truncated.add(self.count)
+                elif self.strategy == None:
+                    positions = reduct.updateRedexPositions(redexes, position)
+                    self.todo.append((reduct, self.count, positions))
+                else:
+                    # Selecting the redex is cheap; do so on expansion.
+                    self.todo.append((reduct, self.count, None))
+
             self.reducts.append((reduct, self.seen[reduct], number, new))
 
         return self.next()
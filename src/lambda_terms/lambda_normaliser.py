@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# Anagopos 3D: A Reduction Graph Visualizer for Term Rewriting and λ-Calculus
+#
+# Copyright (C) 2011 Jeroen Ketema
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Normal forms of lambda terms, computed by an environment machine.
+
+The machine is a strong variant of the Krivine machine. It reduces a term to
+weak head normal form with call-by-name, keeping the arguments of the head as
+closures (a term with an environment) instead of substituting them. Once the
+head is an abstraction without arguments, the machine continues under the
+abstraction; once it is a variable, the machine normalises the arguments from
+left to right. Every beta-step of the machine is a step of the leftmost-
+outermost (normal order) reduction of the term, hence the number of steps is
+the length of the normal order reduction to the normal form. Other reductions
+to the normal form may be shorter.
+
+Environments are linked lists of pairs (value, environment), where a value is
+either a closure or a de Bruijn level: for a variable bound by an abstraction
+the machine went under, the number of abstractions above that abstraction,
+and for the free variable with index i at the top, -i - 1. An argument that
+is a variable is passed as the value bound to the variable, so values never
+form chains of closures that merely rename a variable, and each step takes
+time independent of the number of steps before it. The machine is
+iterative, so deep terms do not exhaust the stack.
+'''
+
+from LambdaTermClass import LambdaAbs, LambdaApp, LambdaVar
+
+# Frames of the continuation: an abstraction to put around the normal form of
+# its body, or an application spine (head, arguments still to normalise,
+# depth) to which the normal form of the next argument is added.
+ABS_FRAME = None
+
+# The closure of a level, for arguments that are variables
+LEVEL_TERM = LambdaVar(0)
+
+def lookup(env, i):
+    '''
+    Return the value bound to the de Bruijn index i.
+    '''
+    while i > 0 and env != None:
+        env = env[1]
+        i -= 1
+
+    if env == None:
+        return -i - 1 # free in the initial term
+
+    return env[0]
+
+def normalise(term, fuel = None):
+    '''
+    Return the normal form of the term and the number of normal order steps
+    needed to reach it. If the term has no normal form within the given number
+    of steps (the fuel), None is returned as the normal form instead.
+    '''
+    steps  = 0
+    env    = None
+    stack  = []
+    depth  = 0
+    frames = []
+
+    while True:
+        # Reduce to weak head normal form.
+        while True:
+            if term.isApp():
+                right = term.right
+
+                if right.isVar():
+                    stack.append(lookup(env, right.value))
+                else:
+                    stack.append((right, env))
+
+                term = term.left
+            elif term.isAbs():
+                if stack != []:
+                    if fuel != None and steps >= fuel:
+                        return (None, steps)
+
+                    steps += 1
+                    env = (stack.pop(), env)
+                else:
+                    frames.append(ABS_FRAME)
+                    env = (depth, env)
+                    depth += 1
+
+                term = term.subterm
+            else:
+                value = lookup(env, term.value)
+
+                if type(value) is tuple:
+                    (term, env) = value
+                else:
+                    break
+
+        # The head is a variable; its arguments are normalised next.
+        result = LambdaVar(depth - value - 1)
+
+        while True:
+            if stack != []:
+                frames.append((result, stack, depth))
+                argument = stack.pop()
+                break
+
+            if frames == []:
+                return (result, steps)
+
+            # Build the normal form upwards, until an argument remains.
+            frame = frames.pop()
+
+            if frame == ABS_FRAME:
+                result = LambdaAbs(result)
+                continue
+
+            (head, stack, depth) = frame
+            result = LambdaApp(head, result)
+
+        if type(argument) is tuple:
+            (term, env) = argument
+        else:
+            (term, env) = (LEVEL_TERM, (argument, None))
+
+        stack = []
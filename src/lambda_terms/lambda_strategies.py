@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+# Anagopos 3D: A Reduction Graph Visualizer for Term Rewriting and λ-Calculus
+#
+# Copyright (C) 2011 Jeroen Ketema
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Reduction strategies for lambda terms.
+
+A strategy selects the redex to contract in a term. Each strategy below
+returns the redex positions of a term allowed by the strategy, i.e., either a
+list with a single position or the empty list when the strategy does not
+allow any step. The redex is found by a walk that stops at the selected redex;
+the other redexes of the term are never enumerated.
+
+  normal          the leftmost-outermost redex
+  applicative     the leftmost-innermost redex
+  head            the head redex, under abstractions
+  weak-head       the head redex, not under abstractions
+  call-by-value   the leftmost redex, not under abstractions, whose argument
+                  is a value (an abstraction or a variable), after the
+                  function and argument have been reduced
+
+The walks build the position of the selected redex in reverse, as the walk
+returns, so no position is copied.
+'''
+
+def found(path):
+    if path == None:
+        return []
+
+    path.reverse()
+    return [path]
+
+def leftmost_outermost(term):
+    if term.isAbs():
+        path = leftmost_outermost(term.subterm)
+
+        if path != None:
+            path.append(0)
+
+        return path
+
+    if term.isApp():
+        if term.left.isAbs():
+            return []
+
+        path = leftmost_outermost(term.left)
+
+        if path != None:
+            path.append(1)
+            return path
+
+        path = leftmost_outermost(term.right)
+
+        if path != None:
+            path.append(2)
+
+        return path
+
+    return None
+
+def leftmost_innermost(term):
+    if term.isAbs():
+        path = leftmost_innermost(term.subterm)
+
+        if path != None:
+            path.append(0)
+
+        return path
+
+    if term.isApp():
+        path = leftmost_innermost(term.left)
+
+        if path != None:
+            path.append(1)
+            return path
+
+        path = leftmost_innermost(term.right)
+
+        if path != None:
+            path.append(2)
+            return path
+
+        if term.left.isAbs():
+            return []
+
+    return None
+
+def head_redex(term, weak):
+    position = []
+
+    while not weak and term.isAbs():
+        position.append(0)
+        term = term.subterm
+
+    while term.isApp():
+        if term.left.isAbs():
+            return [position]
+
+        position.append(1)
+        term = term.left
+
+    return []
+
+def is_value(term):
+    return term.isAbs() or term.isVar()
+
+def value_redex(term):
+    if not term.isApp():
+        return None
+
+    path = value_redex(term.left)
+
+    if path != None:
+        path.append(1)
+        return path
+
+    path = value_redex(term.right)
+
+    if path != None:
+        path.append(2)
+        return path
+
+    if term.left.isAbs() and is_value(term.right):
+        return []
+
+    return None
+
+def normal_order(term):
+    return found(leftmost_outermost(term))
+
+def applicative_order(term):
+    return found(leftmost_innermost(term))
+
+def head(term):
+    return head_redex(term, False)
+
+def weak_head(term):
+    return head_redex(term, True)
+
+def call_by_value(term):
+    return found(value_redex(term))
+
+STRATEGIES = {
+    "normal":        normal_order,
+    "applicative":   applicative_order,
+    "head":          head,
+    "weak-head":     weak_head,
+    "call-by-value": call_by_value
+}
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# Anagopos 3D: A Reduction Graph Visualizer for Term Rewriting and λ-Calculus
+#
+# Copyright (C) 2011 Jeroen Ketema
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Compact binary encoding of lambda terms.
+
+A term is encoded as the sequence of its nodes in pre-order, where every node
+is a single variable-length integer (7 bits per byte, least significant group
+first): 0 for an abstraction, 1 for an application, and i + 2 for the de Bruijn
+index i. As the encoding of a term is unique, it can serve as a canonical key.
+
+Terms are hash-consed, so encodings are stored in the terms once they are
+computed and shared subterms are only encoded once. A reduct thus mostly
+requires new encodings for the nodes on the path to the contracted redex. To
+bound the memory used by deep terms, not every large term stores its encoding
+(see stores_encoding).
+'''
+
+from LambdaTermClass import LambdaAbs, LambdaApp, LambdaVar
+
+ABS_CODE, APP_CODE, VAR_CODE = range(3)
+
+ABS_BYTE = chr(ABS_CODE)
+APP_BYTE = chr(APP_CODE)
+
+# The largest terms, in nodes, that store their encoding.
+CACHE_SIZE = 256
+
+class LambdaCodecException(Exception):
+    pass
+
+def write_number(output, number):
+    while number >= 0x80:
+        output.append(chr((number & 0x7f) | 0x80))
+        number >>= 7
+
+    output.append(chr(number))
+
+def read_numbers(data):
+    numbers  = []
+    number   = 0
+    shift    = 0
+
+    for byte in data:
+        byte = ord(byte)
+        number |= (byte & 0x7f) << shift
+
+        if byte & 0x80:
+            shift += 7
+        else:
+            numbers.append(number)
+            number = 0
+            shift  = 0
+
+    if shift != 0:
+        raise LambdaCodecException("Truncated encoding")
+
+    return numbers
+
+def stores_encoding(term):
+    '''
+    Return whether a term stores its encoding: small terms do, and larger
+    terms do when their size crosses a multiple of CACHE_SIZE. Thus at most
+    CACHE_SIZE nodes are walked between terms that store their encoding,
+    while a path through a term passes at most size / CACHE_SIZE large terms
+    that store theirs.
+    '''
+    size = term.size // CACHE_SIZE
+
+    if size == 0:
+        return True
+    elif term.isAbs():
+        return term.subterm.size // CACHE_SIZE < size
+    else: # term.isApp()
+        return max(term.left.size, term.right.size) // CACHE_SIZE < size
+
+def encode(term):
+    if hasattr(term, "encoding"):
+        return term.encoding
+
+    output = []
+    stack  = [term]
+
+    while stack != []:
+        node = stack.pop()
+
+        if node is not term and stores_encoding(node):
+            output.append(encode(node))
+        elif node.isAbs():
+            output.append(ABS_BYTE)
+            stack.append(node.subterm)
+        elif node.isApp():
+            output.append(APP_BYTE)
+            stack.append(node.right)
+            stack.append(node.left)
+        else: # node.isVar()
+            write_number(output, node.value + VAR_CODE)
+
+    data = "".join(output)
+
+    if stores_encoding(term):
+        term.encoding = data
+
+    return data
+
+def decode(data):
+    # Reading the nodes of a pre-order encoding backwards, the subterms of
+    # each node have been built, in order, on top of the stack.
+    stack = []
+
+    for code in reversed(read_numbers(data)):
+        if code == ABS_CODE:
+            if len(stack) < 1:
+                raise LambdaCodecException("Invalid encoding")
+
+            stack.append(LambdaAbs(stack.pop()))
+        elif code == APP_CODE:
+            if len(stack) < 2:
+                raise LambdaCodecException("Invalid encoding")
+
+            left  = stack.pop()
+            right = stack.pop()
+            stack.append(LambdaApp(left, right))
+        else:
+            stack.append(LambdaVar(code - VAR_CODE))
+
+    if len(stack) != 1:
+        raise LambdaCodecException("Invalid encoding")
+
+    return stack[0]
@@ -32,12 +32,29 @@ from lambda_terms.lambda_term_parser import parse as lambda_term_parser
 from trs_terms.trs_term_parser import parse as trs_term_parser
 from lambda_terms.lambda_random_term import random_term as lambda_random_term
 from trs_terms.trs_random_term import random_term as trs_random_term
+from lambda_terms.LambdaTermClass import LambdaTermIterator
+from lambda_terms.lambda_strategies import STRATEGIES as lambda_strategies
+from lambda_terms.lambda_normaliser import normalise as lambda_normaliser
+from trs_terms.TRSTermClass import TRSTermIterator
+from trs_terms.trs_strategies import STRATEGIES as trs_strategies
+from trs_terms.trs_term_codec import TRSTermCodec
+import lambda_terms.lambda_term_codec as lambda_term_codec
 
 mode = ""
 
 PARSER      = None
 RULE_PARSER = None
 RANDOM_TERM = None
+ITERATOR    = None
+CODEC       = None
+STRATEGIES  = {}
+NORMALISER  = None
+
+def lambda_iterator(term, _, seen, todo, budget, strategy):
+    return LambdaTermIterator(term, seen, todo, budget, strategy)
+
+def trs_iterator(term, rule_set, seen, todo, budget, strategy):
+    return TRSTermIterator(term, rule_set, seen, todo, budget, strategy)
 
 def set_mode(mode_in):
     '''
@@ -45,16 +62,25 @@ def set_mode(mode_in):
     "trs" or "lambda".
     '''
 
-    global mode, PARSER, RULE_PARSER, RANDOM_TERM
+    global mode, PARSER, RULE_PARSER, RANDOM_TERM, ITERATOR, CODEC, \
+        STRATEGIES, NORMALISER
 
     if mode_in == "lambda":
         PARSER      = lambda_term_parser
         RULE_PARSER = None
         RANDOM_TERM = lambda_random_term
+        ITERATOR    = lambda_iterator
+        CODEC       = lambda_term_codec
+        STRATEGIES  = lambda_strategies
+        NORMALISER  = lambda_normaliser
     elif mode_in == "trs":
         PARSER      = trs_term_parser
         RULE_PARSER = trs_parser
         RANDOM_TERM = trs_random_term
+        ITERATOR    = trs_iterator
+        CODEC       = None # set once the signature is known
+        STRATEGIES  = trs_strategies
+        NORMALISER  = None
     else:
         raise Exception("Unsupported mode: " + mode_in)
 
@@ -64,10 +90,14 @@ def get_mode():
     return mode
 
 def parse_rule_set(file_name):
+    global CODEC
+
     if RULE_PARSER == None:
         raise Exception("Rule set parsing not supported in " + mode + " mode")
 
-    return RULE_PARSER(file_name)
+    (rule_set, signature) = RULE_PARSER(file_name)
+    CODEC = TRSTermCodec(signature)
+    return (rule_set, signature)
 
 def parse(term_string, signature):
     '''
@@ -77,3 +107,78 @@ def parse(term_string, signature):
 
 def random_term(signature):
     return RANDOM_TERM(signature)
+
+def get_strategies():
+    '''
+    Return the names of the reduction strategies supported in the current
+    mode.
+    '''
+    return sorted(STRATEGIES.keys())
+
+def get_strategy_name(name, rule_set = None):
+    '''
+    Return the name of the strategy that applies: the named strategy or,
+    without a name, the strategy declared by the rule set, if any.
+    '''
+    if name == None and rule_set != None:
+        name = rule_set.getStrategy()
+
+    return name
+
+def get_strategy(name, rule_set = None):
+    '''
+    Return the function that selects the redexes to contract for the named
+    strategy, or None if all redexes are contracted. Without a name, the
+    strategy declared by the rule set applies, if any.
+    '''
+    name = get_strategy_name(name, rule_set)
+
+    if name == None:
+        return None
+
+    if name not in STRATEGIES:
+        raise Exception("Unsupported strategy in " + mode + " mode: " + name)
+
+    return STRATEGIES[name]
+
+def iterate(term, rule_set, seen = None, todo = None, budget = None,
+            strategy = None):
+    '''
+    Return an iterator over the steps of the reduction graph of a term, where
+    the seen terms and the terms still to explore are optionally kept in the
+    given mapping and queue, and exploration is optionally limited by the
+    given budget. Only the steps allowed by the named strategy are explored
+    (see get_strategy).
+    '''
+    strategy = get_strategy(strategy, rule_set)
+    return ITERATOR(term, rule_set, seen, todo, budget, strategy)
+
+def has_normaliser():
+    return NORMALISER != None
+
+def normalise(term, fuel = None):
+    '''
+    Return the normal form of a term and the number of steps needed to reach
+    it, where the normal form is None if it is not reached within the given
+    number of steps (the fuel).
+    '''
+    if NORMALISER == None:
+        raise Exception("Normal forms not supported in " + mode + " mode")
+
+    return NORMALISER(term, fuel)
+
+def get_codec():
+    '''
+    Return the codec for the compact binary encoding of terms, which provides
+    encode and decode functions.
+    '''
+    if CODEC == None:
+        raise Exception("No term encoding available without a rule set")
+
+    return CODEC
+
+def encode(term):
+    return get_codec().encode(term)
+
+def decode(data):
+    return get_codec().decode(data)
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+# Anagopos 3D: A Reduction Graph Visualizer for Term Rewriting and λ-Calculus
+#
+# Copyright (C) 2011 Jeroen Ketema
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Explore reduction graphs breadth-first using a pool of worker processes.
+
+The graph is explored one level at a time. The frontier of a level is split
+into contiguous chunks, one per worker, and each worker computes the reducts of
+the terms in its chunk. Terms are passed between processes in their compact
+binary encoding, which also serves as their key in the set of terms seen so
+far. This set is sharded over the workers by the hash of the keys, so that no
+process has to hold all terms.
+Numbers are assigned to new terms by the coordinating process, in the order in
+which the reducts of the frontier are listed. Hence, terms are numbered exactly
+as by the sequential iterators, and the same steps are produced in the same
+order. Only the new terms are decoded by the coordinating process.
+'''
+
+import os
+import time
+import zlib
+
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
+from collections import deque
+from multiprocessing import Pipe, Process
+
+EXPAND, LOOKUP, INSERT, STOP = range(4)
+
+class ParallelException(Exception):
+    pass
+
+def shard_of(key, shards):
+    return (zlib.crc32(key) & 0xffffffff) % shards
+
+def reducts(term, rule_set, strategy):
+    if rule_set == None:
+        if strategy == None:
+            positions = term.getRedexPositions()
+        else:
+            positions = strategy(term)
+
+        return [term.reduce(p) for p in positions]
+    else:
+        if strategy == None:
+            redexes = term.getRedexPositions(rule_set)
+        else:
+            redexes = strategy(term, rule_set)
+
+        return [term.reduce(position, rule) for (position, rule) in redexes]
+
+def cpu_time():
+    '''
+    Return the CPU time used by the process. Where possible, this is taken
+    from getrusage, as os.times counts in clock ticks (often 10 ms), which
+    is coarser than the time needed to expand a small level.
+    '''
+    if resource == None:
+        (user, system) = os.times()[:2]
+    else:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        (user, system) = (usage.ru_utime, usage.ru_stime)
+
+    return user + system
+
+def worker(connection, rule_set, codec, strategy):
+    '''
+    Main loop of a worker process, which owns one shard of the seen-set.
+    '''
+    seen = {}
+
+    while True:
+        message = connection.recv()
+        command = message[0]
+
+        if command == EXPAND:
+            start  = cpu_time()
+            result = []
+
+            for data in message[1]:
+                terms = reducts(codec.decode(data), rule_set, strategy)
+                result.append([codec.encode(reduct) for reduct in terms])
+
+            connection.send((cpu_time() - start, result))
+        elif command == LOOKUP:
+            connection.send([seen.get(key, -1) for key in message[1]])
+        elif command == INSERT:
+            for (key, number) in message[1]:
+                seen[key] = number
+        elif command == STOP:
+            connection.close()
+            return
+
+class LevelStatistics:
+    def __init__(self, level, terms, steps, new, wall, cpu):
+        self.level = level
+        self.terms = terms # size of the frontier
+        self.steps = steps
+        self.new   = new
+        self.wall  = wall
+        self.cpu   = cpu # CPU time the workers spent computing reducts
+
+    def speedup(self):
+        '''
+        Return the CPU time spent computing reducts, i.e., the time a single
+        process would need for this, relative to the wall time of the level.
+        '''
+        if self.wall == 0.0:
+            return 1.0
+
+        return self.cpu / self.wall
+
+    def __str__(self):
+        return "level " + str(self.level) + ": " + str(self.terms) \
+            + " terms, " + str(self.steps) + " steps, " + str(self.new) \
+            + " new terms, %.3fs, speedup %.2f" % (self.wall, self.speedup())
+
+class ParallelTermIterator:
+    '''
+    Iterate over the steps of the reduction graph of a term, like the term
+    iterators do. The rule set should be None for lambda terms. The codec
+    provides the encode and decode functions of the binary term encoding. If
+    a strategy is given, only the redexes selected by it are contracted. As
+    only new terms are decoded, the term of a step to a known term is None.
+    '''
+    def __init__(self, term, rule_set, processes, codec, strategy = None):
+        if processes < 1:
+            raise ParallelException("At least one worker process required")
+
+        self.rule_set    = rule_set
+        self.codec       = codec
+        self.stopped     = None # exploration is never limited by a budget
+        self.count       = 0
+        self.level       = 0
+        self.statistics  = []
+        self.connections = []
+        self.processes   = []
+
+        for _ in range(processes):
+            (connection, child_connection) = Pipe()
+            process = Process(target = worker,
+                              args = (child_connection, rule_set, codec,
+                                      strategy))
+            process.daemon = True
+            process.start()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+        key = codec.encode(term)
+        self.send(shard_of(key, processes), (INSERT, [(key, 0)]))
+
+        self.frontier = [(key, 0)]
+        self.reducts  = deque([(term, 0, -1, True)])
+
+    def isTruncated(self, number):
+        return False
+
+    def send(self, shard, message):
+        self.connections[shard].send(message)
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        while self.reducts == deque([]):
+            if self.frontier == []:
+                raise StopIteration
+
+            self.explore_level()
+
+        return self.reducts.popleft()
+
+    def explore_level(self):
+        start  = time.time()
+        shards = len(self.connections)
+        size   = (len(self.frontier) + shards - 1) // shards
+        chunks = []
+
+        for i in range(shards):
+            chunk = self.frontier[i * size:(i + 1) * size]
+            chunks.append(chunk)
+
+            if chunk != []:
+                self.send(i, (EXPAND, [data for (data, _) in chunk]))
+
+        # The steps of the level, in order, as (key, source number).
+        steps = []
+        cpu   = 0.0
+
+        for i in range(shards):
+            if chunks[i] == []:
+                continue
+
+            (elapsed, result) = self.connections[i].recv()
+            cpu += elapsed
+
+            for j in range(len(chunks[i])):
+                number = chunks[i][j][1]
+
+                for key in result[j]:
+                    steps.append((key, number))
+
+        # Look up all reducts in the shards that own them.
+        queries = [[] for _ in range(shards)]
+
+        for (key, _) in steps:
+            queries[shard_of(key, shards)].append(key)
+
+        for i in range(shards):
+            if queries[i] != []:
+                self.send(i, (LOOKUP, queries[i]))
+
+        known = {}
+
+        for i in range(shards):
+            if queries[i] != []:
+                numbers = self.connections[i].recv()
+
+                for j in range(len(numbers)):
+                    if numbers[j] != -1:
+                        known[queries[i][j]] = numbers[j]
+
+        # Number the new terms in the order in which they were found.
+        inserts  = [[] for _ in range(shards)]
+        frontier = []
+
+        for (key, source) in steps:
+            if key in known:
+                self.reducts.append((None, known[key], source, False))
+            else:
+                self.count += 1
+                known[key] = self.count
+                inserts[shard_of(key, shards)].append((key, self.count))
+                frontier.append((key, self.count))
+                term = self.codec.decode(key)
+                self.reducts.append((term, self.count, source, True))
+
+        for i in range(shards):
+            if inserts[i] != []:
+                self.send(i, (INSERT, inserts[i]))
+
+        statistics = LevelStatistics(self.level, len(self.frontier), \
+                                         len(steps), len(frontier), \
+                                         time.time() - start, cpu)
+        self.statistics.append(statistics)
+        self.frontier = frontier
+        self.level += 1
+
+    def close(self):
+        for connection in self.connections:
+            connection.send((STOP,))
+            connection.close()
+
+        for process in self.processes:
+            process.join()
+
+        self.connections = []
+        self.processes   = []
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+# Anagopos 3D: A Reduction Graph Visualizer for Term Rewriting and λ-Calculus
+#
+# Copyright (C) 2011 Jeroen Ketema
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+An XML-RPC transport that keeps its HTTP/1.1 connections open between calls,
+instead of opening a new connection for every call.
+
+Connections are kept in a small pool, so several threads can make calls at
+the same time. When the server has closed an idle connection, the call is
+retried once on a new connection.
+'''
+
+import errno
+import httplib
+import socket
+import threading
+import xmlrpclib
+
+# Errors that indicate the server closed a connection that was kept open
+RESET_ERRORS = (errno.ECONNRESET, errno.ECONNABORTED, errno.EPIPE)
+
+def is_reset(exception):
+    if isinstance(exception, httplib.BadStatusLine):
+        return True
+
+    return isinstance(exception, socket.error) \
+        and exception.args != () and exception.args[0] in RESET_ERRORS
+
+class PersistentTransport(xmlrpclib.Transport):
+    def __init__(self, connections = 1, use_datetime = 0):
+        xmlrpclib.Transport.__init__(self, use_datetime)
+
+        self.size      = connections
+        self.idle      = {} # host -> connections not in use
+        self.open      = 0  # connections in use or idle
+        self.condition = threading.Condition()
+
+    def acquire(self, host):
+        self.condition.acquire()
+
+        try:
+            while True:
+                if self.idle.get(host, []) != []:
+                    return (self.idle[host].pop(), True)
+
+                if self.open < self.size:
+                    self.open += 1
+                    break
+
+                # Another host may hold idle connections; drop one of those.
+                for connections in self.idle.values():
+                    if connections != []:
+                        connections.pop().close()
+                        self.open -= 1
+                        break
+                else:
+                    self.condition.wait()
+        finally:
+            self.condition.release()
+
+        (real_host, _, _) = self.get_host_info(host)
+        return (httplib.HTTPConnection(real_host), False)
+
+    def release(self, host, connection):
+        self.condition.acquire()
+
+        try:
+            self.idle.setdefault(host, []).append(connection)
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def discard(self):
+        self.condition.acquire()
+
+        try:
+            self.open -= 1
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def request(self, host, handler, request_body, verbose = 0):
+        (connection, reused) = self.acquire(host)
+
+        try:
+            try:
+                result = self.post(connection, host, handler, request_body,
+                                   verbose)
+            except Exception as exception:
+                connection.close()
+
+                if not reused or not is_reset(exception):
+                    raise
+
+                # The connection was closed while idle; the request was
+                # not received, so retry it on a new connection.
+                result = self.post(connection, host, handler, request_body,
+                                   verbose)
+        except:
+            connection.close()
+            self.discard()
+            raise
+
+        self.release(host, connection)
+        return result
+
+    def post(self, connection, host, handler, request_body, verbose):
+        if verbose:
+            connection.set_debuglevel(1)
+
+        (_, extra_headers, _) = self.get_host_info(host)
+
+        if connection.sock == None:
+            connection.connect()
+
+            # Requests are small and sent in two parts (headers and body);
+            # without this each call waits for a delayed acknowledgement.
+            connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY,
+                                       1)
+
+        connection.putrequest("POST", handler, skip_accept_encoding = True)
+        connection.putheader("Content-Type", "text/xml")
+        connection.putheader("Content-Length", str(len(request_body)))
+        connection.putheader("User-Agent", self.user_agent)
+
+        for (key, value) in extra_headers or []:
+            connection.putheader(key, value)
+
+        try:
+            connection.endheaders(request_body) # one packet, Python 2.7
+        except TypeError:
+            connection.endheaders()
+            connection.send(request_body)
+
+        try:
+            response = connection.getresponse(buffering = True) # Python 2.7
+        except TypeError:
+            response = connection.getresponse()
+
+        data = response.read() # the whole response, to reuse the socket
+
+        if response.status != 200:
+            raise xmlrpclib.ProtocolError(host + handler, response.status,
+                                          response.reason, response.msg)
+
+        if response.will_close:
+            connection.close()
+
+        (parser, unmarshaller) = self.getparser()
+        parser.feed(data)
+        parser.close()
+        return unmarshaller.close()
+
+    def close(self):
+        self.condition.acquire()
+
+        try:
+            for connections in self.idle.values():
+                for connection in connections:
+                    connection.close()
+                    self.open -= 1
+
+            self.idle = {}
+        finally:
+            self.condition.release()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# Anagopos 3D: A Reduction Graph Visualizer for Term Rewriting and λ-Calculus
+#
+# Copyright (C) 2011 Jeroen Ketema
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Compact storage for reduction graphs.
+
+The steps of a graph are kept in typed arrays, one entry per step for the
+source, the target, the flags, and the handle of the step (e.g., the id of the
+edge that was drawn for it). This takes less than 20 bytes per step, where a
+tuple of Python objects takes about 200. Terms are kept in a separate table
+indexed by their number, which can be disabled if the terms are not needed.
+Terms missing from the table can be loaded when they are first requested,
+e.g., from a snapshot (see graph_snapshot).
+
+The term iterators do not keep the graph: they only hold the steps of the term
+being expanded and the frontier, whose terms are needed to expand it, and hand
+every step to their consumer (the GUI, the batch writers, or a snapshot). The
+consumer keeps the steps it needs in a reduction graph.
+'''
+
+from array import array
+
+# Flags of a step
+NEW_TARGET = 1 # the target of the step was first reached by the step
+
+NO_HANDLE = -1
+
+class ReductionGraph:
+    def __init__(self, keep_terms = True, loader = None):
+        self.sources    = array('i')
+        self.targets    = array('i')
+        self.flags      = array('B')
+        self.handles    = array('l')
+        self.terms      = []
+        self.keep_terms = keep_terms
+        self.loader     = loader # returns the term with the given number
+
+    def addTerm(self, number, term):
+        if not self.keep_terms:
+            return
+
+        while len(self.terms) <= number:
+            self.terms.append(None)
+
+        self.terms[number] = term
+
+    def getTerm(self, number):
+        if number >= len(self.terms):
+            return None
+
+        term = self.terms[number]
+
+        if term == None and self.loader != None:
+            term = self.loader(number)
+            self.terms[number] = term
+
+        return term
+
+    def hasTerm(self, number):
+        '''
+        Return whether the term is in the table, i.e., whether it can be
+        returned without loading it.
+        '''
+        return number < len(self.terms) and self.terms[number] != None
+
+    def loadTerms(self):
+        '''
+        Load all terms that are still missing, after which the loader is no
+        longer used.
+        '''
+        if self.loader == None:
+            return
+
+        for number in range(len(self.terms)):
+            self.getTerm(number)
+
+        self.loader = None
+
+    def getTermCount(self):
+        return len(self.terms)
+
+    def addStep(self, source, target, new, handle = NO_HANDLE):
+        self.sources.append(source)
+        self.targets.append(target)
+        self.flags.append(NEW_TARGET if new else 0)
+        self.handles.append(handle)
+        return len(self.sources) - 1
+
+    def addReduct(self, reduct):
+        '''
+        Add a reduct as produced by the term iterators.
+        '''
+        (term, number, previous, new) = reduct
+
+        if new:
+            self.addTerm(number, term)
+
+        if previous != -1:
+            self.addStep(previous, number, new)
+
+    def getStep(self, i):
+        '''
+        Return the source, target, and whether the target is new for a step.
+        '''
+        new = self.flags[i] & NEW_TARGET != 0
+        return (self.sources[i], self.targets[i], new)
+
+    def getHandle(self, i):
+        return self.handles[i]
+
+    def setHandle(self, i, handle):
+        self.handles[i] = handle
+
+    def __len__(self):
+        return len(self.sources)
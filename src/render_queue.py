@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# Anagopos 3D: A Reduction Graph Visualizer for Term Rewriting and λ-Calculus
+#
+# Copyright (C) 2011 Jeroen Ketema
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+A queue of calls to UbiGraph that are sent by a worker thread, so that terms
+can be rewritten while earlier steps are still being drawn.
+
+The queue stands in for the XML-RPC server proxy: calls made on it are queued
+and return immediately, without a result. The worker takes the calls from the
+queue in order and sends all calls available, up to a maximum, in a single
+MultiCall request. Hence, calls reach the server in the order in which they
+were made, which keeps removals and changes of color consistent with what was
+drawn before. The queue is bounded: when the worker falls behind, a call blocks
+until there is room again. Errors of the server are raised by the next call
+made on the queue, or by close().
+'''
+
+import threading
+import xmlrpclib
+
+from Queue import Queue, Empty
+
+STOP = None
+
+class QueuedMethod(object):
+    def __init__(self, queue, name):
+        self.queue = queue
+        self.name  = name
+
+    def __getattr__(self, name):
+        return QueuedMethod(self.queue, self.name + "." + name)
+
+    def __call__(self, *args):
+        self.queue.call(self.name, args)
+
+class RenderQueue(object):
+    def __init__(self, server, size = 10000, batch = 1000):
+        self.server = server
+        self.calls  = Queue(size)
+        self.batch  = batch
+        self.error  = None
+
+        self.thread = threading.Thread(target = self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __getattr__(self, name):
+        return QueuedMethod(self, name)
+
+    def check(self):
+        if self.error != None:
+            (error, self.error) = (self.error, None)
+            raise error
+
+    def call(self, name, args):
+        self.check()
+        self.calls.put((name, args))
+
+    def run(self):
+        while True:
+            calls = [self.calls.get()]
+
+            try:
+                while len(calls) < self.batch and calls[-1] != STOP:
+                    calls.append(self.calls.get_nowait())
+            except Empty:
+                pass
+
+            try:
+                self.send([call for call in calls if call != STOP])
+            except Exception as exception:
+                if self.error == None:
+                    self.error = exception
+
+            if calls[-1] == STOP:
+                return
+
+    def send(self, calls):
+        if len(calls) == 0:
+            return
+
+        if len(calls) == 1:
+            (name, args) = calls[0]
+            getattr(self.server, name)(*args)
+            return
+
+        multicall = xmlrpclib.MultiCall(self.server)
+
+        for (name, args) in calls:
+            getattr(multicall, name)(*args)
+
+        for _ in multicall():
+            pass # raises the Fault of a failed call
+
+    def close(self):
+        if self.thread.isAlive():
+            self.calls.put(STOP)
+            self.thread.join()
+
+        self.check()
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+# Anagopos 3D: A Reduction Graph Visualizer for Term Rewriting and λ-Calculus
+#
+# Copyright (C) 2011 Jeroen Ketema
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+A first-in first-out queue for the terms still to be explored by the term
+iterators, which moves to disk once the resident memory of the process exceeds
+a ceiling.
+
+Entries of the queue are tuples (term, number, redexes). While the ceiling has
+not been reached entries are kept in memory. Afterwards, new entries are
+encoded and appended to a temporary file, which is memory-mapped to read them
+back in order once the entries in memory are exhausted. The redex positions of
+spilled entries are not stored, but recomputed by the iterator (they are None
+when read back). When the file is drained the queue returns to memory.
+'''
+
+import mmap
+import os
+import struct
+import tempfile
+
+from collections import deque
+from cPickle import dumps, loads
+
+HEADER = struct.Struct("<Iq") # length of the encoded term, number of the term
+
+def pickle_term(term):
+    return dumps(term, 2)
+
+def resident_memory():
+    '''
+    Return the resident memory of the process in bytes. Where it cannot be
+    determined, the peak resident memory is returned instead.
+    '''
+    try:
+        statm = open("/proc/self/statm")
+
+        try:
+            pages = int(statm.read().split()[1])
+        finally:
+            statm.close()
+
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError, ValueError):
+        import resource
+
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage * 1024 # Linux reports kilobytes
+
+class SpillingQueue:
+    def __init__(self, ceiling, directory = None, encode = pickle_term,
+                 decode = loads, check_interval = 1024):
+        self.memory         = deque()
+        self.ceiling        = ceiling
+        self.directory      = directory
+        self.encode         = encode
+        self.decode         = decode
+        self.check_interval = check_interval
+        self.appends        = 0
+
+        self.spilling     = False
+        self.file         = None
+        self.map          = None
+        self.write_offset = 0
+        self.read_offset  = 0
+        self.file_entries = 0
+
+        # Totals over the lifetime of the queue
+        self.spilled_entries = 0
+        self.spilled_bytes   = 0
+
+    def __len__(self):
+        return len(self.memory) + self.file_entries
+
+    def append(self, entry):
+        if not self.spilling:
+            self.appends += 1
+
+            if self.appends % self.check_interval == 0 \
+                    and resident_memory() > self.ceiling:
+                self.spilling = True
+
+        if not self.spilling:
+            self.memory.append(entry)
+            return
+
+        if self.file == None:
+            self.file = tempfile.TemporaryFile(dir = self.directory)
+
+        (term, number) = entry[:2]
+        data = self.encode(term)
+        self.file.seek(self.write_offset)
+        self.file.write(HEADER.pack(len(data), number))
+        self.file.write(data)
+
+        size = HEADER.size + len(data)
+        self.write_offset    += size
+        self.file_entries    += 1
+        self.spilled_entries += 1
+        self.spilled_bytes   += size
+
+    def popleft(self):
+        if len(self.memory) != 0:
+            return self.memory.popleft()
+
+        if self.file_entries == 0:
+            raise IndexError("pop from an empty queue")
+
+        # The map covers the file as it was when it was last mapped, which
+        # holds all entries written until then. Entries written later are
+        # only mapped once they are read.
+        start = self.read_offset + HEADER.size
+
+        if self.map == None or len(self.map) < start:
+            self.remap()
+
+        (length, number) = HEADER.unpack_from(self.map, self.read_offset)
+
+        if len(self.map) < start + length:
+            self.remap()
+
+        term = self.decode(self.map[start:start + length])
+
+        self.read_offset   = start + length
+        self.file_entries -= 1
+
+        if self.file_entries == 0:
+            self.reset()
+
+        return (term, number, None)
+
+    def remap(self):
+        if self.map != None:
+            self.map.close()
+
+        self.file.flush()
+        self.map = mmap.mmap(self.file.fileno(), self.write_offset,
+                             access = mmap.ACCESS_READ)
+
+    def reset(self):
+        '''
+        Empty the file once all entries have been read back.
+        '''
+        self.map.close()
+        self.map = None
+        self.file.truncate(0)
+        self.write_offset = 0
+        self.read_offset  = 0
+        self.spilling     = False
+
+    def close(self):
+        if self.map != None:
+            self.map.close()
+            self.map = None
+
+        if self.file != None:
+            self.file.close()
+            self.file = None
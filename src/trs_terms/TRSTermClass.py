@@ -16,11 +16,49 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import threading
+
 from collections import deque
+from weakref import WeakValueDictionary
 
 class TRSException(Exception):
     pass
 
+# All TRS terms are hash-consed: every distinct term is constructed only once
+# and kept in the table below for as long as it is referenced elsewhere. The
+# hash of a term is computed once, Merkle-style, from its function symbol and
+# the hashes of its direct subterms. Hence, terms can be hashed in constant
+# time and two terms are equal if and only if they are identical. As terms
+# are shared, they are immutable (except for the rule set attached for
+# iteration and the stored encoding, see trs_term_codec): rewriting a term
+# only rebuilds the path to the rewritten position and instantiating a
+# variable reuses the term bound to it.
+terms = WeakValueDictionary()
+
+# Terms are built by several threads in the GUI (see anagopos3d), so new terms
+# are added to the table under a lock.
+terms_lock = threading.Lock()
+
+def add_term(key, term):
+    '''
+    Add a new term to the table and return it, unless another thread added
+    an equal term first, which is then returned instead.
+    '''
+    terms_lock.acquire()
+
+    try:
+        existing = terms.get(key)
+
+        if existing != None:
+            return existing
+
+        terms[key] = term
+        return term
+    finally:
+        terms_lock.release()
+
+FUN_TAG, VAR_TAG = range(2)
+
 class TRSFunctionSymbol(object):
     def __init__(self, symbol, arity):
         self.symbol = symbol
@@ -54,8 +92,7 @@ class TRSFunctionSymbol(object):
         return self.symbol
 
 class TRSTerm(object):
-    def __init__(self):
-        self.rule_set = None
+    __slots__ = ('hash_value', 'rule_set', 'size', 'encoding', '__weakref__')
 
     def isFun(self):
         return False
@@ -69,6 +106,59 @@ class TRSTerm(object):
     def getRedexPositions(self, rule_set):
         return []
 
+    def getRootRedexes(self, rule_set):
+        return []
+
+    def getSize(self):
+        return self.size
+
+    def getSubterm(self, position):
+        term = self
+
+        for i in position:
+            term = term.subterms[i]
+
+        return term
+
+    def updateRedexPositions(self, rule_set, redexes, position):
+        '''
+        Return the redex positions of the term, where the term is the reduct
+        obtained by contracting the redex at the given position in a term with
+        the given redex positions. Only the contractum and the ancestors of the
+        contracted position, where matching rules might have changed, are
+        inspected.
+        '''
+        length  = len(position)
+        updated = []
+
+        for redex in redexes:
+            redex_position = redex[0]
+
+            if redex_position[:length] == position \
+                    or position[:len(redex_position)] == redex_position:
+                continue
+
+            updated.append(redex)
+
+        subterm = self.getSubterm(position)
+
+        for (redex_position, rule) in subterm.getRedexPositions(rule_set):
+            updated.append((position + redex_position, rule))
+
+        for i in range(length):
+            ancestor = position[:i]
+            subterm  = self.getSubterm(ancestor)
+
+            for (_, rule) in subterm.getRootRedexes(rule_set):
+                updated.append((ancestor, rule))
+
+        # The sort is stable, hence rules at the same position stay in order.
+        def redex_position(redex):
+            return redex[0]
+
+        updated.sort(key = redex_position)
+        return updated
+
     def substitute(self, substitution):
         raise TRSException("Not implemented")
 
@@ -76,28 +166,28 @@ class TRSTerm(object):
         raise TRSException("Invalid operation")
 
     def isEqual(self, term):
-        return False
+        return self is term
 
     def copy(self):
-        raise Exception("Not implemented")
+        return self
 
     def toString(self):
         raise Exception("Not implemented")
 
     def __eq__(self, other):
-        if not isinstance(other, TRSTerm):
-            return False
-
-        return self.isEqual(other)
+        return self is other
 
     def __ne__(self, other):
-        if not isinstance(other, TRSTerm):
-            return True
-
-        return not self.isEqual(other)
+        return self is not other
 
     def __hash__(self):
-        return self.toString().__hash__()
+        return self.hash_value
+
+    def __setattr__(self, name, value):
+        if name not in ('rule_set', 'encoding') and hasattr(self, name):
+            raise TRSException("TRS terms are immutable")
+
+        super(TRSTerm, self).__setattr__(name, value)
 
     def __str__(self):
         return self.toString()
@@ -109,14 +199,29 @@ class TRSTerm(object):
         return TRSTermIterator(self, self.rule_set)
 
 class TRSFun(TRSTerm):
-    def __init__(self, symbol, subterms):
-        super(TRSFun, self).__init__()
+    __slots__ = ('symbol', 'subterms')
 
+    def __new__(cls, symbol, subterms):
         if len(subterms) != symbol.getArity():
             raise TRSException("Number of subterms different from arity")
 
-        self.symbol   = symbol
-        self.subterms = subterms
+        subterms = tuple(subterms)
+        key      = (FUN_TAG, symbol, subterms)
+        term     = terms.get(key)
+
+        if term == None:
+            term = object.__new__(cls)
+            term.symbol     = symbol
+            term.subterms   = subterms
+            term.rule_set   = None
+            term.size       = sum([subterm.size for subterm in subterms]) + 1
+            term.hash_value = hash(key)
+            term = add_term(key, term)
+
+        return term
+
+    def __reduce__(self):
+        return (TRSFun, (self.symbol, self.subterms))
 
     def isFun(self):
         return True
@@ -144,16 +249,21 @@ class TRSFun(TRSTerm):
 
         return substitution
 
-    def getRedexPositions(self, rule_set):
+    def getRootRedexes(self, rule_set):
         redexes = []
 
-        for rule in rule_set:
-            substitution = rule.getLeft().match(self)
+        for rule in rule_set.getCandidates(self):
+            substitution = rule.match(self)
 
             if substitution != None:
                 redex = ([], rule)
                 redexes.append(redex)
 
+        return redexes
+
+    def getRedexPositions(self, rule_set):
+        redexes = self.getRootRedexes(rule_set)
+
         for i in range(self.symbol.getArity()):
             def prepend_i(redex):
                 return ([i] + redex[0], redex[1])
@@ -165,59 +275,37 @@ class TRSFun(TRSTerm):
 
     def substitute(self, substitution):
         subterms = []
+        changed  = False
 
         for subterm in self.subterms:
-            subterms.append(subterm.substitute(substitution))
+            new_subterm = subterm.substitute(substitution)
+            changed = changed or new_subterm is not subterm
+            subterms.append(new_subterm)
+
+        if not changed:
+            return self
 
         return TRSFun(self.symbol, subterms)
 
     def reduce(self, position, rule):
         if position == []:
-            substitution = rule.getLeft().match(self)
+            substitution = rule.match(self)
 
             if substitution == None:
                 raise TRSException("Invalid operation")
 
-            return rule.getRight().substitute(substitution)
+            return rule.instantiate(substitution)
         else:
             arity = self.symbol.getArity()
 
             if position[0] >= arity:
                 raise TRSException("Invalid operation")
 
-            subterms = []
-
-            for i in range(arity):
-                if i == position[0]:
-                    subterm = self.subterms[i].reduce(position[1:], rule)
-                else:
-                    subterm = self.subterms[i].copy()
-
-                subterms.append(subterm)
-
+            i        = position[0]
+            subterm  = self.subterms[i].reduce(position[1:], rule)
+            subterms = self.subterms[:i] + (subterm,) + self.subterms[i + 1:]
             return TRSFun(self.symbol, subterms)
 
-    def isEqual(self, term):
-        if not term.isFun():
-            return False
-
-        if self.symbol != term.symbol:
-            return False
-
-        for i in range(self.symbol.getArity()):
-            if not self.subterms[i].isEqual(term.subterms[i]):
-                return False
-
-        return True
-
-    def copy(self):
-        subterms = []
-
-        for subterm in self.subterms:
-            subterms.append(subterm.copy())
-
-        return TRSFun(self.symbol, subterms)
-
     def toString(self):
         term  = self.symbol.getSymbol()
         count = self.symbol.getArity()
@@ -237,10 +325,24 @@ class TRSFun(TRSTerm):
         return term
 
 class TRSVar(TRSTerm):
-    def __init__(self, variable):
-        super(TRSVar, self).__init__()
+    __slots__ = ('variable',)
+
+    def __new__(cls, variable):
+        key  = (VAR_TAG, variable)
+        term = terms.get(key)
+
+        if term == None:
+            term = object.__new__(cls)
+            term.variable   = variable
+            term.rule_set   = None
+            term.size       = 1
+            term.hash_value = hash(key)
+            term = add_term(key, term)
+
+        return term
 
-        self.variable = variable
+    def __reduce__(self):
+        return (TRSVar, (self.variable,))
 
     def isVar(self):
         return True
@@ -250,18 +352,9 @@ class TRSVar(TRSTerm):
 
     def substitute(self, substitution):
         if self.variable in substitution:
-            return substitution[self.variable].copy()
+            return substitution[self.variable]
         else:
-            return TRSVar(self.variable)
-
-    def isEqual(self, term):
-        if not term.isVar():
-            return False
-
-        return self.variable == term.variable
-
-    def copy(self):
-        return TRSVar(self.variable)
+            return self
 
     def toString(self):
         return self.variable
@@ -271,6 +364,12 @@ class TRSRule:
         self.left  = left
         self.right = right
 
+        # Functions to match the left-hand side against a term and to
+        # instantiate the right-hand side with the resulting substitution.
+        # These may be replaced by compiled versions (see trs_rule_compiler).
+        self.match       = left.match
+        self.instantiate = right.substitute
+
     def getLeft(self):
         return self.left
 
@@ -280,41 +379,223 @@ class TRSRule:
     def __str__(self):
         return str(self.left) + " -> " + str(self.right)
 
+class TRSRuleIndex:
+    '''
+    A discrimination tree over the left-hand sides of rules. Each left-hand side
+    is stored as the sequence of its symbols in pre-order, where all variables
+    are represented by the same wildcard.
+    '''
+    def __init__(self):
+        self.children = {}
+        self.variable = None # child for the wildcard
+        self.rules    = []
+
+    def insert(self, term, number):
+        node  = self
+        stack = [term]
+
+        while stack != []:
+            term = stack.pop()
+
+            if term.isVar():
+                if node.variable == None:
+                    node.variable = TRSRuleIndex()
+
+                node = node.variable
+            else:
+                if term.symbol not in node.children:
+                    node.children[term.symbol] = TRSRuleIndex()
+
+                node = node.children[term.symbol]
+                stack.extend(reversed(term.subterms))
+
+        node.rules.append(number)
+
+    def retrieve(self, term):
+        '''
+        Return the numbers of the rules whose left-hand sides might match the
+        term. Non-linear left-hand sides are not checked for consistency.
+        '''
+        numbers = []
+        # Each entry is a node with the linked list of subterms still to visit.
+        todo = [(self, (term, None))]
+
+        while todo != []:
+            (node, pending) = todo.pop()
+
+            if pending == None:
+                numbers += node.rules
+                continue
+
+            (term, pending) = pending
+
+            if node.variable != None:
+                todo.append((node.variable, pending))
+
+            if term.isFun() and term.symbol in node.children:
+                for subterm in reversed(term.subterms):
+                    pending = (subterm, pending)
+
+                todo.append((node.children[term.symbol], pending))
+
+        return numbers
+
+class TRSRuleSet:
+    '''
+    A list of rules, indexed to quickly find the rules that might be applied at
+    the root of a term. The rule set also records the name of the strategy
+    under which the rules are applied (see trs_strategies), if not full
+    rewriting.
+    '''
+    def __init__(self, rules, strategy = None):
+        self.rules    = rules
+        self.strategy = strategy
+        self.index    = TRSRuleIndex()
+
+        for i in range(len(rules)):
+            self.index.insert(rules[i].getLeft(), i)
+
+    def getStrategy(self):
+        return self.strategy
+
+    def getCandidates(self, term):
+        numbers = self.index.retrieve(term)
+        numbers.sort()
+        return [self.rules[i] for i in numbers]
+
+    def __len__(self):
+        return len(self.rules)
+
+    def __getitem__(self, i):
+        return self.rules[i]
+
+    def __iter__(self):
+        return iter(self.rules)
+
 class TRSTermIterator:
-    def __init__(self, term, rule_set):
+    '''
+    Iterate over the steps of the reduction graph of a term, breadth-first.
+    The terms seen so far are kept in a dictionary, unless another mapping
+    from terms to their numbers is given (e.g., a FingerprintSet). Likewise,
+    the terms still to be explored are kept in a deque, unless another queue
+    is given (e.g., a SpillingQueue, which may drop the redex positions).
+
+    If a budget is given (see ExplorationBudget), the iterator stops when a
+    limit of the budget is reached, recording the limit in stopped, and does
+    not expand terms that are too large, which are marked as truncated.
+
+    If a strategy is given (see trs_strategies), only the redexes selected by
+    the strategy are contracted.
+    '''
+    def __init__(self, term, rule_set, seen = None, todo = None,
+                 budget = None, strategy = None):
+        if rule_set == None:
+            raise TRSException("No rule set given")
+
+        if seen == None:
+            seen = {}
+
+        if todo == None:
+            todo = deque()
+
+        self.rule_set = rule_set
+        self.strategy = strategy
+
+        seen[term] = 0
+
+        # Like its reducts, the initial term is not expanded if it is too
+        # large.
+        if budget != None and budget.truncates(term):
+            truncated = set([0])
+        else:
+            truncated = set()
+            todo.append((term, 0, self.getRedexPositions(term)))
+
         self.term     = term
-        self.seen     = {term : 0}
-        self.todo     = deque([(term, 0)])
+        self.seen     = seen
+        self.todo     = todo
         self.count    = 0
         self.reducts  = deque([(term, 0, -1, True)])
-        self.rule_set = rule_set
 
-        if rule_set == None:
-            raise TRSException("No rule set given")
+        self.budget    = budget
+        self.stopped   = None
+        self.truncated = truncated
+
+        # The term taken from the queue but not expanded yet, the depth of
+        # the last term expanded, and the number of the last term at that
+        # depth.
+        self.pending   = None
+        self.depth     = 0
+        self.level_end = 0
 
     def __iter__(self):
-        return TRSTermIterator(self.term, self.rule_set)
+        return TRSTermIterator(self.term, self.rule_set,
+                               strategy = self.strategy)
+
+    def isTruncated(self, number):
+        return number in self.truncated
+
+    def getRedexPositions(self, term):
+        if self.strategy == None:
+            return term.getRedexPositions(self.rule_set)
+
+        return self.strategy(term, self.rule_set)
 
     def next(self):
         if self.reducts != deque([]):
             reduct = self.reducts.popleft()
             return reduct
 
-        if self.todo == deque([]):
-            raise StopIteration
+        if self.pending == None:
+            if len(self.todo) == 0:
+                self.stopped = None
+                raise StopIteration
+
+            self.pending = self.todo.popleft()
 
-        (term, number) = self.todo.popleft()
+        (term, number, redexes) = self.pending
+
+        # Terms are numbered breadth-first, so a term is one level deeper
+        # than the last one expanded iff it was found after that level.
+        if number > self.level_end:
+            depth = self.depth + 1
+        else:
+            depth = self.depth
 
-        for (position, rule) in term.getRedexPositions(self.rule_set):
+        if self.budget != None:
+            self.stopped = self.budget.exhausted(self.count + 1, depth)
+
+            if self.stopped != None:
+                raise StopIteration
+
+        if depth != self.depth:
+            self.depth     = depth
+            self.level_end = self.count
+
+        self.pending = None
+
+        if redexes == None:
+            redexes = self.getRedexPositions(term)
+
+        for (position, rule) in redexes:
             reduct = term.reduce(position, rule)
             new = False
 
             if reduct not in self.seen:
                 self.count += 1
                 self.seen[reduct] = self.count
-                self.todo.append((reduct, self.count))
                 new = True
 
+                if self.budget != None and self.budget.truncates(reduct):
+                    self.truncated.add(self.count)
+                elif self.strategy == None:
+                    positions = reduct.updateRedexPositions(self.rule_set, \
+                                                            redexes, position)
+                    self.todo.append((reduct, self.count, positions))
+                else:
+                    # The strategy selects the redexes on expansion.
+                    self.todo.append((reduct, self.count, None))
+
             self.reducts.append((reduct, self.seen[reduct], number, new))
 
         return self.next()
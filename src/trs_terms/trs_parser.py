@@ -21,7 +21,9 @@
 
 import xml.parsers.expat
 
-from TRSTermClass import TRSFunctionSymbol, TRSFun, TRSVar, TRSRule
+from TRSTermClass import TRSFunctionSymbol, TRSFun, TRSVar, TRSRule, TRSRuleSet
+from trs_rule_compiler import compile_rule
+from trs_strategies import STRATEGIES
 
 class TRSParseException(Exception):
     pass
@@ -55,6 +57,9 @@ fun_level, fun_name_level, fun_arg_level, var_level, \
     lambda_level, app_level = range(6)
 termlevel = []
 
+# For parsing the strategy:
+strategy = ""
+
 # For parsing signatures:
 signature   = {}
 func_symbol = None
@@ -73,8 +78,8 @@ term          = None
 
 def reset_global():
     global parser, level, sublevel, trslevel, siglevel, funclevel, ruleslevel, \
-        rulelevel, termlevel, signature, func_symbol, arity, rules, lhs, rhs, \
-        symbolstack, subterms, subterm_count, term
+        rulelevel, termlevel, strategy, signature, func_symbol, arity, rules, \
+        lhs, rhs, symbolstack, subterms, subterm_count, term
 
     parser = xml.parsers.expat.ParserCreate()
 
@@ -88,6 +93,8 @@ def reset_global():
 
     termlevel = []
 
+    strategy = ""
+
     signature   = {}
     func_symbol = None
     arity       = None
@@ -226,9 +233,9 @@ def start_lower(name, attrs):
             raise TRSParseException("Unexpected element " + name)
     elif sublevel == trs_level:
         start_trs(name, attrs)
-    # We ignore what is in the strategy, startterm, status, and metainfomation
-    # sections, as we do not need the data from those sections. Note that we
-    # do not even perform santity checks on these sections.
+    # We ignore what is in the startterm, status, and metainfomation sections,
+    # as we do not need the data from those sections. Note that we do not even
+    # perform santity checks on these sections. The strategy is character data.
 
 def start_element(name, attrs):
     if level == top_level:
@@ -404,11 +411,13 @@ def end_element(name):
         raise TRSParseException("Unexpected element " + name)
 
 def char_data(data):
-    global func_symbol, arity
+    global strategy, func_symbol, arity
 
     length = len(termlevel)
 
-    if funclevel == name_level:
+    if level == lower_level and sublevel == strategy_level:
+        strategy += data
+    elif funclevel == name_level:
         if func_symbol == None:
             func_symbol = data
         else:
@@ -440,12 +449,23 @@ def TRSParseRules(file_name):
     finally:
         f.close()
 
+    # The strategy is one of FULL, INNERMOST, OUTERMOST, or CONTEXTSENSITIVE,
+    # where the last requires replacement maps, which are not supported.
+    name = strategy.strip().lower()
+
+    if name == "" or name == "full":
+        name = None
+    elif name not in STRATEGIES:
+        raise TRSParseException("Unsupported strategy " + strategy.strip())
+
     rule_set = []
 
     for (lhs, rhs) in rules:
         if lhs.isVar():
             raise TRSParseException("LHS of a rule cannot be a variable!")
 
-        rule_set.append(TRSRule(lhs, rhs))
+        rule = TRSRule(lhs, rhs)
+        compile_rule(rule)
+        rule_set.append(rule)
 
-    return (rule_set, signature)
+    return (TRSRuleSet(rule_set, name), signature)
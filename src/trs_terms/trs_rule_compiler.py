@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# Anagopos 3D: A Reduction Graph Visualizer for Term Rewriting and λ-Calculus
+#
+# Copyright (C) 2011 Jeroen Ketema
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Compile TRS rules into specialised matching and instantiation functions.
+
+The left-hand side of a rule is compiled into a matcher that checks the
+function symbols of the pattern directly and returns the subterms bound to the
+variables as a tuple. The right-hand side is compiled into a builder that
+constructs the instance of the right-hand side from such a tuple. As terms are
+hash-consed, ground subterms of a rule are compared and reused by identity,
+and the repeated variables of a non-linear rule are checked by identity.
+'''
+
+from TRSTermClass import TRSFun
+
+def is_ground(term):
+    if term.isVar():
+        return False
+
+    for subterm in term.subterms:
+        if not is_ground(subterm):
+            return False
+
+    return True
+
+class RuleCompiler:
+    def __init__(self):
+        self.namespace = {"Fun" : TRSFun}
+        self.count     = 0
+        self.lines     = []
+
+    def new_name(self, prefix):
+        name = prefix + str(self.count)
+        self.count += 1
+        return name
+
+    def constant(self, value):
+        name = self.new_name("k")
+        self.namespace[name] = value
+        return name
+
+    def emit(self, line):
+        self.lines.append("    " + line)
+
+    def match_term(self, pattern, name, bound):
+        if is_ground(pattern):
+            self.emit("if " + name + " is not " + self.constant(pattern) \
+                          + ": return None")
+        elif pattern.isVar():
+            if pattern.variable in bound:
+                self.emit("if " + name + " is not " + bound[pattern.variable] \
+                              + ": return None")
+            else:
+                bound[pattern.variable] = name
+        else:
+            symbol = self.constant(pattern.symbol.getSymbol())
+            arity  = str(pattern.symbol.getArity())
+            self.emit("if " + name + ".__class__ is not Fun" \
+                          + " or " + name + ".symbol.symbol != " + symbol \
+                          + " or " + name + ".symbol.arity != " + arity \
+                          + ": return None")
+
+            names = [self.new_name("t") for _ in pattern.subterms]
+            self.emit("(" + ", ".join(names) + ",) = " + name + ".subterms")
+
+            for i in range(len(names)):
+                self.match_term(pattern.subterms[i], names[i], bound)
+
+    def build_term(self, term, bound):
+        if is_ground(term):
+            return self.constant(term)
+        elif term.isVar():
+            if term.variable in bound:
+                return bound[term.variable]
+            else:
+                return self.constant(term)
+        else:
+            symbol   = self.constant(term.symbol)
+            subterms = [self.build_term(s, bound) for s in term.subterms]
+            return "Fun(" + symbol + ", (" + ", ".join(subterms) + ",))"
+
+    def compile_function(self, name):
+        source = "\n".join(self.lines) + "\n"
+        exec source in self.namespace
+        return self.namespace[name]
+
+def compile_matcher(left):
+    '''
+    Return a matcher for the pattern and the variables it binds, in the order
+    in which the matcher returns their values.
+    '''
+    compiler = RuleCompiler()
+    bound    = {}
+
+    compiler.lines.append("def match(t):")
+    compiler.match_term(left, "t", bound)
+
+    variables = bound.keys()
+    values    = [bound[variable] for variable in variables]
+    compiler.emit("return (" + "".join([v + ", " for v in values]) + ")")
+    return (compiler.compile_function("match"), variables)
+
+def compile_builder(right, variables):
+    compiler = RuleCompiler()
+    bound    = {}
+
+    for variable in variables:
+        bound[variable] = compiler.new_name("v")
+
+    values = [bound[variable] for variable in variables]
+    compiler.lines.append("def instantiate(values):")
+
+    if values != []:
+        compiler.emit("(" + ", ".join(values) + ",) = values")
+
+    compiler.emit("return " + compiler.build_term(right, bound))
+    return compiler.compile_function("instantiate")
+
+def compile_rule(rule):
+    '''
+    Replace the generic matching and instantiation functions of the rule by
+    compiled ones. The substitutions passed between the compiled functions are
+    tuples instead of dictionaries.
+    '''
+    (match, variables) = compile_matcher(rule.getLeft())
+    rule.match       = match
+    rule.instantiate = compile_builder(rule.getRight(), variables)
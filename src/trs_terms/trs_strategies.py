@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Anagopos 3D: A Reduction Graph Visualizer for Term Rewriting and λ-Calculus
+#
+# Copyright (C) 2011 Jeroen Ketema
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Rewrite strategies for TRS terms, as declared in the strategy section of a
+TPDB problem.
+
+Each strategy returns the redexes of a term allowed by the strategy, as pairs
+of a position and a rule, in the same order as getRedexPositions. Both
+strategies take a single pass over the term:
+
+  innermost   bottom-up: a subterm is only matched against the rules when
+              none of its subterms contains a redex
+  outermost   top-down: the subterms of a redex are not visited
+
+Under full rewriting, the default, all redexes are contracted.
+'''
+
+def innermost(term, rule_set):
+    if term.isVar():
+        return []
+
+    redexes = []
+
+    for i in range(len(term.subterms)):
+        def prepend_i(redex):
+            return ([i] + redex[0], redex[1])
+
+        subterm_redexes = innermost(term.subterms[i], rule_set)
+        redexes += map(prepend_i, subterm_redexes)
+
+    if redexes == []:
+        redexes = term.getRootRedexes(rule_set)
+
+    return redexes
+
+def outermost(term, rule_set):
+    if term.isVar():
+        return []
+
+    redexes = term.getRootRedexes(rule_set)
+
+    if redexes != []:
+        return redexes
+
+    for i in range(len(term.subterms)):
+        def prepend_i(redex):
+            return ([i] + redex[0], redex[1])
+
+        subterm_redexes = outermost(term.subterms[i], rule_set)
+        redexes += map(prepend_i, subterm_redexes)
+
+    return redexes
+
+# The names used in TPDB problems, in lower case; full rewriting needs no
+# strategy.
+STRATEGIES = {
+    "full":      None,
+    "innermost": innermost,
+    "outermost": outermost
+}
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# Anagopos 3D: A Reduction Graph Visualizer for Term Rewriting and λ-Calculus
+#
+# Copyright (C) 2011 Jeroen Ketema
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Compact binary encoding of TRS terms.
+
+A term is encoded as the sequence of its nodes in pre-order, where every node
+starts with a variable-length integer (7 bits per byte, least significant group
+first). A function symbol is encoded by its number in the symbol table of the
+signature plus one. A variable is encoded by 0, followed by the length and the
+UTF-8 bytes of its name. Symbols are numbered in the order of their names, so
+all codecs for the same signature agree and the encoding of a term is unique.
+
+Terms are hash-consed, so encodings are stored in the terms once they are
+computed and shared subterms are only encoded once. As the encoding depends on
+the signature, a term stores the symbol numbering along with its encoding. To
+bound the memory used by deep terms, not every large term stores its encoding
+(see stores_encoding).
+'''
+
+from TRSTermClass import TRSFunctionSymbol, TRSFun, TRSVar
+
+VAR_CODE = 0
+
+# The size, in nodes, up to which all terms store their encoding.
+CACHE_SIZE = 256
+
+# The symbol numberings, shared by all codecs for the same signature.
+numberings = {}
+
+class TRSCodecException(Exception):
+    pass
+
+def write_number(output, number):
+    while number >= 0x80:
+        output.append(chr((number & 0x7f) | 0x80))
+        number >>= 7
+
+    output.append(chr(number))
+
+def read_number(data, position):
+    number = 0
+    shift  = 0
+
+    while True:
+        if position >= len(data):
+            raise TRSCodecException("Truncated encoding")
+
+        byte = ord(data[position])
+        position += 1
+        number |= (byte & 0x7f) << shift
+
+        if not byte & 0x80:
+            return (number, position)
+
+        shift += 7
+
+def stores_encoding(term):
+    '''
+    Return whether a term stores its encoding: small terms do, and larger
+    terms do when their size crosses a multiple of CACHE_SIZE. Thus at most
+    CACHE_SIZE nodes are walked between terms that store their encoding,
+    while a path through a term passes at most size / CACHE_SIZE large terms
+    that store theirs.
+    '''
+    size = term.size // CACHE_SIZE
+
+    if size == 0:
+        return True
+
+    largest = max([subterm.size for subterm in term.subterms])
+    return largest // CACHE_SIZE < size
+
+class TRSTermCodec:
+    def __init__(self, signature):
+        self.symbols = []
+        self.codes   = {}
+
+        for name in sorted(signature.keys()):
+            symbol = TRSFunctionSymbol(name, signature[name])
+            self.symbols.append(symbol)
+            self.codes[name] = len(self.symbols)
+
+        key        = tuple(sorted(signature.items()))
+        self.codes = numberings.setdefault(key, self.codes)
+
+    def encode(self, term):
+        stored = getattr(term, "encoding", None)
+
+        if stored != None and stored[0] is self.codes:
+            return stored[1]
+
+        output = []
+        stack  = [term]
+
+        while stack != []:
+            node = stack.pop()
+
+            if node is not term and stores_encoding(node):
+                output.append(self.encode(node))
+            elif node.isFun():
+                name = node.symbol.getSymbol()
+
+                if name not in self.codes:
+                    raise TRSCodecException("Unknown function symbol " + name)
+
+                write_number(output, self.codes[name])
+                stack.extend(reversed(node.subterms))
+            else: # node.isVar()
+                name = node.variable
+
+                if isinstance(name, unicode):
+                    name = name.encode("utf-8")
+
+                write_number(output, VAR_CODE)
+                write_number(output, len(name))
+                output.append(name)
+
+        data = "".join(output)
+
+        if stores_encoding(term):
+            term.encoding = (self.codes, data)
+
+        return data
+
+    def decode(self, data):
+        # Read the nodes and then build the term bottom-up: reading the nodes
+        # of a pre-order encoding backwards, the arguments of each function
+        # symbol have been built, in order, on top of the stack.
+        nodes    = []
+        position = 0
+
+        while position < len(data):
+            (code, position) = read_number(data, position)
+
+            if code == VAR_CODE:
+                (length, position) = read_number(data, position)
+                name = data[position:position + length].decode("utf-8")
+                position += length
+                nodes.append(name)
+            elif code <= len(self.symbols):
+                nodes.append(self.symbols[code - 1])
+            else:
+                raise TRSCodecException("Unknown function symbol " + str(code))
+
+        stack = []
+
+        for node in reversed(nodes):
+            if isinstance(node, TRSFunctionSymbol):
+                arity = node.getArity()
+
+                if len(stack) < arity:
+                    raise TRSCodecException("Invalid encoding")
+
+                subterms = [stack.pop() for _ in range(arity)]
+                stack.append(TRSFun(node, subterms))
+            else:
+                stack.append(TRSVar(node))
+
+        if len(stack) != 1:
+            raise TRSCodecException("Invalid encoding")
+
+        return stack[0]
@@ -14,23 +14,63 @@
 
 import xmlrpclib
 
+from persistent_transport import PersistentTransport
+from render_queue import RenderQueue
+
 class Ubigraph:
-  def __init__(self, URL='http://127.0.0.1:20738/RPC2'):
-    self.server = xmlrpclib.Server(URL)
-    self.server_backup = self.server
+  def __init__(self, URL='http://127.0.0.1:20738/RPC2', connections=1):
+    # Keep connections open between calls, rather than one per call.
+    self.transport = PersistentTransport(connections)
+    self.server = xmlrpclib.Server(URL, transport=self.transport)
+    self.renderQueue = None
+    self.resetIds()
     self.defaultVertexStyle = VertexStyle(self, None, id=0)
     self.defaultEdgeStyle = EdgeStyle(self, None, id=0)
 
+  def resetIds(self):
+    # Ids are assigned by the client, so creating an object needs no reply
+    # from the server. Id 0 is the default style.
+    self.nextVertexId = 1
+    self.nextEdgeId = 1
+    self.nextVertexStyleId = 1
+    self.nextEdgeStyleId = 1
+
+  def newVertexId(self):
+    self.nextVertexId += 1
+    return self.nextVertexId - 1
+
+  def newEdgeId(self):
+    self.nextEdgeId += 1
+    return self.nextEdgeId - 1
+
+  def newVertexStyleId(self):
+    self.nextVertexStyleId += 1
+    return self.nextVertexStyleId - 1
+
+  def newEdgeStyleId(self):
+    self.nextEdgeStyleId += 1
+    return self.nextEdgeStyleId - 1
+
   def clear(self):
     self.server.ubigraph.clear()
+    self.resetIds()
+
+  def setEdgeAttribute(self, id, attribute, value):
+    self.server.ubigraph.set_edge_attribute(id, attribute, value)
     
-  def beginMultiCall(self):
-    self.server = xmlrpclib.MultiCall(self.server)
-    
-  def endMultiCall(self):
-    for result in self.server():
-      print result
-    self.server = self.server_backup
+  def startRenderQueue(self, size=10000, batch=1000):
+    """Send all further calls from a worker thread, in batches of at most
+    batch calls, with at most size calls waiting."""
+    if self.renderQueue is None:
+      self.renderQueue = RenderQueue(self.server, size, batch)
+      self.server = self.renderQueue
+
+  def stopRenderQueue(self):
+    if self.renderQueue is not None:
+      renderQueue = self.renderQueue
+      self.renderQueue = None
+      self.server = renderQueue.server
+      renderQueue.close()
 
   def newVertex(self, id=None, style=None, color=None, shape=None,
                 label=None, size=None, fontcolor=None, fontfamily=None,
@@ -81,10 +121,9 @@ class Vertex:
       visible=None, callback=None):
     self.U = U
     if id == None:
-      self.id = U.server.ubigraph.new_vertex()
-    else:
-      U.server.ubigraph.new_vertex_w_id(id)
-      self.id = id
+      id = U.newVertexId()
+    U.server.ubigraph.new_vertex_w_id(id)
+    self.id = id
     self.set(style=style, color=color, shape=shape, label=label, 
       size=size, fontcolor=fontcolor, fontfamily=fontfamily, 
       fontsize=fontsize, visible=visible, callback=callback)
@@ -128,10 +167,9 @@ class Edge:
              strength=None, visible=None, width=None):
     self.U = U
     if id == None:
-      self.id = U.server.ubigraph.new_edge(x.id,y.id)
-    else:
-      U.server.ubigraph.new_edge_w_id(id,x.id,y.id)
-      self.id = id
+      id = U.newEdgeId()
+    U.server.ubigraph.new_edge_w_id(id,x.id,y.id)
+    self.id = id
     self.set(style=style, arrow=arrow, arrow_position=arrow_position, 
       arrow_length=arrow_length, arrow_radius=arrow_radius, color=color,
       label=label, fontcolor=fontcolor, fontfamily=fontfamily,
@@ -204,10 +242,9 @@ class VertexStyle:
         parentStyle2 = U.defaultVertexStyle
 
     if id == None:
-      self.id = U.server.ubigraph.new_vertex_style(parentStyle2.id)
-    else:
-      U.server.ubigraph.new_vertex_style_w_id(id, parentStyle2.id)
-      self.id = id
+      id = U.newVertexStyleId()
+    U.server.ubigraph.new_vertex_style_w_id(id, parentStyle2.id)
+    self.id = id
     self.set(color=color, shape=shape, label=label, size=size,
       fontcolor=fontcolor, fontfamily=fontfamily, fontsize=fontsize, 
       visible=visible)
@@ -255,10 +292,9 @@ class EdgeStyle:
         parentStyle2 = U.defaultEdgeStyle
 
     if id == None:
-      self.id = U.server.ubigraph.new_edge_style(parentStyle2.id)
-    else:
-      U.server.ubigraph.new_edge_style_w_id(id, parentStyle2.id)
-      self.id = id
+      id = U.newEdgeStyleId()
+    U.server.ubigraph.new_edge_style_w_id(id, parentStyle2.id)
+    self.id = id
     self.set(arrow=arrow, arrow_position=arrow_position,
       arrow_length=arrow_length, arrow_radius=arrow_radius,
       arrow_reverse=arrow_reverse, color=color, label=label,